@@ -4,8 +4,9 @@ Carga variables de entorno y define settings globales
 """
 
 from pydantic_settings import BaseSettings
-from typing import List
-from functools import lru_cache
+from typing import List, Optional
+from functools import cached_property, lru_cache
+import logging
 
 
 class Settings(BaseSettings):
@@ -21,6 +22,23 @@ class Settings(BaseSettings):
     
     # Database
     database_url: str
+    db_pool_class: str = "queue"  # "queue" | "null"
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    db_sync_pool_size: int = 3  # engine sync (solo gee/reports legacy)
+    db_sync_max_overflow: int = 0
+    db_pool_recycle: int = 3600
+    db_pool_timeout: int = 30
+    db_pool_pre_ping: bool = True
+    db_pgbouncer: bool = False  # PgBouncer en modo transaction delante de Postgres
+    db_query_cache_size: int = 1200  # SQL compilado cacheado por engine (default SQLAlchemy: 500)
+    db_query_guard_max: int = 0  # Solo debug: máx. queries por request (0 = solo cabecera X-DB-Queries)
+    
+    # Redis (opcional) - cache compartido entre workers
+    redis_url: Optional[str] = None
+    redis_socket_timeout: float = 0.05
+    # Sin Redis, cache de respuestas del dashboard en memoria: solo con 1 worker
+    response_cache_local: bool = False
     
     # JWT
     jwt_secret_key: str
@@ -28,6 +46,10 @@ class Settings(BaseSettings):
     access_token_expire_minutes: int = 30
     refresh_token_expire_days: int = 7
     
+    # Rate limit de login/register/refresh/change-password
+    auth_rate_limit_attempts: int = 5
+    auth_rate_limit_window_seconds: int = 10
+    
     # Google OAuth
     google_client_id: str = ""
     google_client_secret: str = ""
@@ -49,7 +71,21 @@ class Settings(BaseSettings):
     # Google Drive
     google_drive_folder_id: str = ""
     
-    @property
+    # Cache en disco de los PDFs de informes (descargados de Drive)
+    pdf_cache_dir: str = "/tmp/muorbita-pdf-cache"
+    pdf_cache_max_age_hours: int = 168  # se borran los PDFs más antiguos que esto
+    pdf_cache_max_mb: int = 1024  # y los más viejos si el total lo supera
+    
+    # PDFs generados más grandes que esto no van en base64 dentro del JSON:
+    # se guardan en disco y se devuelve pdf_url
+    max_inline_pdf_bytes: int = 2 * 1024 * 1024
+    generated_pdf_ttl_hours: int = 24  # vida de esos PDFs en disco (y de su pdf_url)
+    
+    # Expone /metrics (Prometheus) si prometheus-client está instalado.
+    # Desactivado por defecto: no lleva autenticación, restringirlo en el proxy
+    metrics_enabled: bool = False
+    
+    @cached_property
     def cors_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.cors_origins.split(",")]
     
@@ -71,3 +107,17 @@ def get_settings() -> Settings:
 
 # Instancia global
 settings = get_settings()
+
+
+def configure_logging() -> None:
+    """Logger "muorbita": DEBUG en desarrollo, INFO en producción"""
+    logger = logging.getLogger("muorbita")
+    logger.setLevel(logging.DEBUG if settings.debug else logging.INFO)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+
+
+configure_logging()
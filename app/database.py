@@ -4,18 +4,92 @@ Configuración de SQLAlchemy para PostgreSQL (Neon)
 """
 
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from typing import AsyncIterator, Tuple
+import logging
+import time
+import uuid
 
 from app.config import settings
 
-# Neon requiere SSL y NullPool para serverless
-# NullPool desactiva connection pooling (Neon lo maneja)
+logger = logging.getLogger("muorbita")
+
+
+def _pool_options(use_async: bool = False) -> dict:
+    """
+    Opciones de pool según DB_POOL_CLASS.
+    - queue: QueuePool contra el endpoint "-pooler" de Neon (PgBouncer).
+      DATABASE_URL debe apuntar al host "-pooler".
+      pre_ping descarta conexiones muertas antes de usarlas (sin 500s).
+    - null: una conexión nueva por request (fallback, endpoint directo).
+    Con DB_PGBOUNCER=true no se hace pre_ping: PgBouncer gestiona los backends.
+
+    El engine async (todos los routers salvo gee/reports) usa DB_POOL_SIZE +
+    DB_MAX_OVERFLOW; el sync, solo para esas rutas legacy, DB_SYNC_POOL_SIZE +
+    DB_SYNC_MAX_OVERFLOW. Máximo de conexiones por worker = suma de los
+    cuatro (por defecto 20 + 10 + 3 + 0 = 33).
+    """
+    if settings.db_pool_class == "null":
+        return {"poolclass": NullPool}
+    if use_async:
+        pool_size, max_overflow = settings.db_pool_size, settings.db_max_overflow
+    else:
+        pool_size, max_overflow = settings.db_sync_pool_size, settings.db_sync_max_overflow
+    return {
+        "poolclass": AsyncAdaptedQueuePool if use_async else QueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_recycle": settings.db_pool_recycle,
+        "pool_timeout": settings.db_pool_timeout,
+        "pool_pre_ping": settings.db_pool_pre_ping and not settings.db_pgbouncer,
+    }
+
+
+def _async_database_url() -> Tuple[URL, dict]:
+    """
+    DATABASE_URL (formato libpq) → URL asyncpg + connect_args.
+    asyncpg no acepta sslmode/channel_binding en la query: sslmode pasa a ssl=.
+    """
+    url = make_url(settings.database_url)
+    query = dict(url.query)
+    sslmode = query.pop("sslmode", None)
+    query.pop("channel_binding", None)
+
+    connect_args = {}
+    if sslmode and sslmode != "disable":
+        connect_args["ssl"] = sslmode
+
+    # PgBouncer (transaction pooling) no soporta prepared statements con nombre
+    # entre transacciones: sin cache de statements y nombres únicos.
+    if settings.db_pgbouncer:
+        connect_args.update({
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+        })
+    return url.set(drivername="postgresql+asyncpg", query=query), connect_args
+
+
+# Neon requiere SSL. Engine sync: solo rutas legacy (gee, reports), pool pequeño
 engine = create_engine(
     settings.database_url,
-    poolclass=NullPool,  # Importante para Neon serverless
     echo=settings.debug,  # Log SQL queries en desarrollo
+    query_cache_size=settings.db_query_cache_size,
+    **_pool_options(),
+)
+
+# Engine async (asyncpg) para los routers async: auth, dashboard, images, webhooks
+_async_url, _async_connect_args = _async_database_url()
+async_engine = create_async_engine(
+    _async_url,
+    echo=settings.debug,
+    connect_args=_async_connect_args,
+    query_cache_size=settings.db_query_cache_size,
+    **_pool_options(use_async=True),
 )
 
 # Session factory
@@ -25,6 +99,13 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 # Base para modelos
 Base = declarative_base()
 
@@ -41,24 +122,55 @@ def get_db():
         db.close()
 
 
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Dependency para obtener sesión async de BD.
+    Uso: db: AsyncSession = Depends(get_async_db)
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
 def init_db():
     """
     Inicializa la BD creando todas las tablas.
     Solo usar en desarrollo - en producción usar migraciones.
     """
+    from app.models import load_all_models
+    load_all_models()
     Base.metadata.create_all(bind=engine)
 
 
+# Resultado del último health check: (time.monotonic(), ok)
+HEALTH_CHECK_CACHE_SECONDS = 2.0
+_last_check: tuple = (0.0, False)
+
+
+def pool_status() -> str:
+    """Estado de los pools (checkouts, overflow) para logs"""
+    return f"sync: {engine.pool.status()} | async: {async_engine.pool.status()}"
+
+
 def check_db_connection() -> bool:
     """
     Verifica que la conexión a BD funcione.
-    Útil para health checks.
+    Útil para health checks. El resultado se cachea HEALTH_CHECK_CACHE_SECONDS
+    para que los probes del load balancer no hagan un round trip cada vez.
     """
+    global _last_check
+    checked_at, ok = _last_check
+    now = time.monotonic()
+    if now - checked_at < HEALTH_CHECK_CACHE_SECONDS:
+        return ok
+
     try:
-        db = SessionLocal()
-        db.execute(text("SELECT 1"))
-        db.close()
-        return True
+        # AUTOCOMMIT: no deja la conexión "idle in transaction" en PgBouncer
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("SELECT 1"))
+        ok = True
     except Exception as e:
-        print(f"Database connection error: {e}")
-        return False
\ No newline at end of file
+        logger.error("Database connection error: %s", e)
+        ok = False
+
+    _last_check = (now, ok)
+    return ok
\ No newline at end of file
@@ -5,20 +5,24 @@ Middleware y dependencias comunes para inyección
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
+import hmac
 
-from app.database import get_db
-from app.services.auth import verify_access_token
+from app.database import get_async_db
+from app.services.auth import verify_access_token_cached
+from app.services.client_cache import get_client_cached
 from app.models.client import Client
 
 # Bearer token security
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
 async def get_current_client(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> Client:
     """
     Dependency que obtiene el cliente actual desde el JWT token.
@@ -26,7 +30,7 @@ async def get_current_client(
     """
     token = credentials.credentials
     
-    payload = verify_access_token(token)
+    payload = await verify_access_token_cached(token)
     if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -41,7 +45,7 @@ async def get_current_client(
             detail="Token inválido",
         )
     
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = await get_client_cached(db, client_id)
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -51,6 +55,25 @@ async def get_current_client(
     return client
 
 
+async def get_full_current_client(
+    current_client: Client = Depends(get_current_client),
+    db: AsyncSession = Depends(get_async_db)
+) -> Client:
+    """
+    Como get_current_client, pero devuelve el modelo ORM ligado a la sesión.
+    Usar solo en endpoints que modifican el cliente.
+    """
+    client = (await db.execute(
+        select(Client).where(Client.id == current_client.id).limit(1)
+    )).scalars().first()
+    if not client:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Cliente no encontrado",
+        )
+    return client
+
+
 async def get_current_active_client(
     current_client: Client = Depends(get_current_client)
 ) -> Client:
@@ -66,8 +89,8 @@ async def get_current_active_client(
 
 
 async def get_optional_client(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(HTTPBearer(auto_error=False)),
-    db: Session = Depends(get_db)
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db: AsyncSession = Depends(get_async_db)
 ) -> Optional[Client]:
     """
     Dependency opcional - no falla si no hay token.
@@ -77,7 +100,7 @@ async def get_optional_client(
         return None
     
     token = credentials.credentials
-    payload = verify_access_token(token)
+    payload = await verify_access_token_cached(token)
     
     if not payload:
         return None
@@ -86,7 +109,7 @@ async def get_optional_client(
     if not client_id:
         return None
     
-    return db.query(Client).filter(Client.id == client_id).first()
+    return await get_client_cached(db, client_id)
 
 
 def verify_webhook_secret(secret: str) -> bool:
@@ -94,4 +117,7 @@ def verify_webhook_secret(secret: str) -> bool:
     Verifica secret de webhooks de n8n
     """
     from app.config import settings
-    return secret == settings.n8n_webhook_secret
+    return hmac.compare_digest(
+        (secret or "").encode("utf-8"),
+        (settings.n8n_webhook_secret or "").encode("utf-8"),
+    )
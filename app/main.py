@@ -4,13 +4,24 @@ FastAPI backend para dashboard de agricultura de precisión
 """
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
+import logging
 import time
 from app.config import settings
-from app.database import check_db_connection
+from app.database import async_engine, check_db_connection, pool_status
+from app.responses import MuOrbitaJSONResponse
+from app.services.http_client import close_http_client
+from app.services.redis_client import close_redis
+from app.services.query_guard import install_query_guard, query_guard_middleware
 from app.routers import auth_router, dashboard_router, webhooks_router, gee_router, reports_router, images_router
 
+try:
+    from prometheus_client import make_asgi_app
+except ImportError:
+    make_asgi_app = None
+
+logger = logging.getLogger("muorbita")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -18,18 +29,28 @@ async def lifespan(app: FastAPI):
     Lifecycle events: startup y shutdown
     """
     # Startup
-    print(f"🚀 Starting {settings.app_name}...")
+    logger.info("🚀 Starting %s...", settings.app_name)
+    
+    # Los validadores Pydantic ya se compilan al importar los modelos; lo que
+    # queda perezoso es el JSON Schema de /openapi.json: generarlo aquí y no
+    # en la primera visita a /docs
+    if app.docs_url:
+        app.openapi()
     
     # Verificar conexión a BD
     if check_db_connection():
-        print("✅ Database connection OK")
+        logger.info("✅ Database connection OK")
     else:
-        print("❌ Database connection FAILED")
+        logger.error("❌ Database connection FAILED")
+    logger.info("DB pool: %s", pool_status())
     
     yield
     
     # Shutdown
-    print(f"👋 Shutting down {settings.app_name}...")
+    logger.info("👋 Shutting down %s...", settings.app_name)
+    await close_http_client()
+    await close_redis()
+    await async_engine.dispose()
 
 
 # Crear app
@@ -39,9 +60,12 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs" if settings.debug else None,
     redoc_url="/redoc" if settings.debug else None,
+    default_response_class=MuOrbitaJSONResponse,
     lifespan=lifespan
 )
 
+API_PREFIX = f"/api/{settings.api_version}"
+
 
 # CORS
 app.add_middleware(
@@ -53,16 +77,21 @@ app.add_middleware(
 )
 
 
-# Request timing middleware
-@app.middleware("http")
+# Request timing middleware (solo en debug)
 async def add_process_time_header(request: Request, call_next):
-    start_time = time.time()
+    start = time.perf_counter_ns()
     response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
+    response.headers["X-Process-Time"] = f"{(time.perf_counter_ns() - start) / 1e6:.2f}"
     return response
 
 
+if settings.debug:
+    app.middleware("http")(add_process_time_header)
+    # Contador de queries por request (detector de N+1)
+    install_query_guard()
+    app.middleware("http")(query_guard_middleware)
+
+
 # Exception handlers
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -70,7 +99,7 @@ async def global_exception_handler(request: Request, exc: Exception):
     Handler global para excepciones no controladas
     """
     if settings.debug:
-        return JSONResponse(
+        return MuOrbitaJSONResponse(
             status_code=500,
             content={
                 "detail": str(exc),
@@ -78,7 +107,7 @@ async def global_exception_handler(request: Request, exc: Exception):
             }
         )
     else:
-        return JSONResponse(
+        return MuOrbitaJSONResponse(
             status_code=500,
             content={"detail": "Error interno del servidor"}
         )
@@ -107,15 +136,19 @@ async def health_check():
 
 
 # Routers SIN prefix interno → main.py añade /api/v1
-app.include_router(auth_router, prefix=f"/api/{settings.api_version}")
-app.include_router(dashboard_router, prefix=f"/api/{settings.api_version}")
-app.include_router(webhooks_router, prefix=f"/api/{settings.api_version}")
-app.include_router(gee_router, prefix=f"/api/{settings.api_version}")
+app.include_router(auth_router, prefix=API_PREFIX)
+app.include_router(dashboard_router, prefix=API_PREFIX)
+app.include_router(webhooks_router, prefix=API_PREFIX)
+app.include_router(gee_router, prefix=API_PREFIX)
 
 # Routers CON prefix interno → main.py NO añade nada
 app.include_router(images_router)
 app.include_router(reports_router)
 
+# Métricas Prometheus (cola y duración de bcrypt, ver services/auth_pool.py)
+if settings.metrics_enabled and make_asgi_app is not None:
+    app.mount("/metrics", make_asgi_app())
+
 
 # Para desarrollo local
 if __name__ == "__main__":
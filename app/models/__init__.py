@@ -1,12 +1,40 @@
 """
 Mu.Orbita API - SQLAlchemy Models
+Los modelos se importan bajo demanda (PEP 562): `from app.models import Kpi`
+solo carga app.models.kpi. Antes de configurar los mappers se cargan todos
+para que las relationship("...") por nombre se resuelvan.
 """
 
-from app.models.client import Client
-from app.models.parcel import Parcel
-from app.models.job import Job
-from app.models.kpi import Kpi
-from app.models.report import Report
-from .gee_image import GEEImage
+import importlib
+
+from sqlalchemy import event
+from sqlalchemy.orm import Mapper
+
+_MODEL_MAP = {
+    "Client": "app.models.client",
+    "Parcel": "app.models.parcel",
+    "Job": "app.models.job",
+    "Kpi": "app.models.kpi",
+    "Report": "app.models.report",
+    "GEEImage": "app.models.gee_image",
+}
 
 __all__ = ["Client", "Parcel", "Job", "Kpi", "Report"]
+
+
+def __getattr__(name):
+    module_path = _MODEL_MAP.get(name)
+    if module_path is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module_path), name)
+
+
+def load_all_models() -> None:
+    """Importa todos los modelos (registro completo en Base.metadata)"""
+    for module_path in _MODEL_MAP.values():
+        importlib.import_module(module_path)
+
+
+@event.listens_for(Mapper, "before_configured")
+def _load_models_before_configure():
+    load_all_models()
@@ -1,8 +1,18 @@
 """
 Mu.Orbita API - Client Model
+
+MIGRACIÓN SQL (ejecutar en Neon, fuera de transacción):
+    -- Antes: comprobar que no hay emails duplicados ignorando mayúsculas
+    --   SELECT lower(email), count(*) FROM clients GROUP BY 1 HAVING count(*) > 1;
+    CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ix_client_email_lower
+        ON clients (lower(email));
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_clients_active
+        ON clients (created_at)
+        INCLUDE (email, client_name)
+        WHERE status = 'active';
 """
 
-from sqlalchemy import Column, String, Numeric, Boolean, DateTime, Text
+from sqlalchemy import Column, String, Numeric, Boolean, DateTime, Text, Index, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -13,6 +23,16 @@ from app.database import Base
 
 class Client(Base):
     __tablename__ = "clients"
+    __table_args__ = (
+        # Clientes activos (jobs programados de n8n)
+        Index(
+            "ix_clients_active",
+            "created_at",
+            postgresql_where=text("status = 'active'"),
+            postgresql_include=["email", "client_name"],
+        ),
+    )
+    __mapper_args__ = {"eager_defaults": True}
     
     # Primary key
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -58,7 +78,7 @@ class Client(Base):
     last_login_at = Column(DateTime(timezone=True), nullable=True)
     
     # Metadata
-    client_metadata = Column(JSONB, default={})
+    client_metadata = Column(JSONB, default=dict)
     
     # Relationships
     parcels = relationship("Parcel", back_populates="client", cascade="all, delete-orphan")
@@ -67,3 +87,12 @@ class Client(Base):
     
     def __repr__(self):
         return f"<Client {self.email}>"
+
+    @classmethod
+    def email_matches(cls, email):
+        """Filtro por email sin distinguir mayúsculas (usa ix_client_email_lower)"""
+        return func.lower(cls.email) == func.lower(email)
+
+
+# Búsqueda por email case-insensitive
+Index("ix_client_email_lower", func.lower(Client.email), unique=True)
@@ -14,19 +14,32 @@ MIGRACIÓN SQL (ejecutar en Neon):
     ALTER TABLE gee_images ADD COLUMN IF NOT EXISTS bounds_south FLOAT;
     ALTER TABLE gee_images ADD COLUMN IF NOT EXISTS bounds_east FLOAT;
     ALTER TABLE gee_images ADD COLUMN IF NOT EXISTS bounds_west FLOAT;
+
+    -- Una imagen por (job, índice): permite INSERT ... ON CONFLICT DO UPDATE
+    DELETE FROM gee_images a USING gee_images b
+        WHERE a.job_id = b.job_id AND a.index_type = b.index_type AND a.id < b.id;
+    CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_gee_image_job_index
+        ON gee_images (job_id, index_type);
+
+    -- job_id sólo ya es prefijo de uq_gee_image_job_index: índice redundante
+    DROP INDEX CONCURRENTLY IF EXISTS ix_gee_images_job_id;
 """
 
-from sqlalchemy import Column, String, Text, Float, DateTime, Integer, func
+from sqlalchemy import Column, String, Text, Float, DateTime, Integer, Index, func
 from app.database import Base
 
 
 class GEEImage(Base):
     __tablename__ = "gee_images"
+    __table_args__ = (
+        Index("uq_gee_image_job_index", "job_id", "index_type", unique=True),
+    )
+    __mapper_args__ = {"eager_defaults": True}
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     
     # Identificación
-    job_id = Column(String(100), nullable=False, index=True)
+    job_id = Column(String(100), nullable=False)  # indexado vía uq_gee_image_job_index
     index_type = Column(String(20), nullable=False)  # NDVI, NDWI, EVI, etc.
     filename = Column(String(100), nullable=False)    # PNG_NDVI.png
     
@@ -1,8 +1,19 @@
 """
 Mu.Orbita API - Job Model
+
+MIGRACIÓN SQL (ejecutar en Neon, fuera de transacción):
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_jobs_client_created
+        ON jobs (client_id, created_at DESC);
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_jobs_client_completed
+        ON jobs (client_id, completed_at DESC)
+        WHERE status = 'completed';
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_job_client_created_desc
+        ON jobs (client_id, status, created_at DESC);
+    DROP INDEX CONCURRENTLY IF EXISTS ix_jobs_client_recent;
+    DROP INDEX CONCURRENTLY IF EXISTS ix_jobs_status;
 """
 
-from sqlalchemy import Column, String, Numeric, Boolean, DateTime, Integer, Date, Text, ForeignKey
+from sqlalchemy import Column, String, Numeric, Boolean, DateTime, Integer, Date, Text, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -13,6 +24,19 @@ from app.database import Base
 
 class Job(Base):
     __tablename__ = "jobs"
+    __table_args__ = (
+        # Listado de jobs del dashboard sin filtro (más recientes primero)
+        Index("ix_jobs_client_created", "client_id", text("created_at DESC")),
+        # Último job completado por cliente (summary / recomendaciones)
+        Index(
+            "ix_jobs_client_completed",
+            "client_id", text("completed_at DESC"),
+            postgresql_where=text("status = 'completed'"),
+        ),
+        # /dashboard/jobs con filtro opcional por status
+        Index("ix_job_client_created_desc", "client_id", "status", text("created_at DESC")),
+    )
+    __mapper_args__ = {"eager_defaults": True}
     
     # Primary key
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -39,7 +63,7 @@ class Job(Base):
     buffer_meters = Column(Integer, default=2000)
     
     # Estado
-    status = Column(String(50), default="pending", index=True)
+    status = Column(String(50), default="pending")
     progress = Column(Integer, default=0)
     
     # GEE
@@ -68,7 +92,7 @@ class Job(Base):
     completed_at = Column(DateTime(timezone=True), nullable=True)
     
     # Metadata
-    job_metadata = Column(JSONB, default={})
+    job_metadata = Column(JSONB, default=dict)
     
     # Relationships
     client = relationship("Client", back_populates="jobs")
@@ -1,9 +1,17 @@
 """
 Mu.Orbita API - KPI Model
 Serie temporal de métricas satelitales por parcela
+
+MIGRACIÓN SQL (ejecutar en Neon, fuera de transacción):
+    -- Índice cubriente: el último KPI por parcela sale con index-only scan
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_kpi_parcel_date_desc_cov
+        ON kpis (parcel_id, observation_date DESC)
+        INCLUDE (ndvi_mean, ndwi_mean, stress_area_pct);
+    DROP INDEX CONCURRENTLY IF EXISTS ix_kpi_parcel_date_desc;
+    ALTER INDEX ix_kpi_parcel_date_desc_cov RENAME TO ix_kpi_parcel_date_desc;
 """
 
-from sqlalchemy import Column, String, Numeric, DateTime, Date, ForeignKey, UniqueConstraint
+from sqlalchemy import Column, String, Numeric, DateTime, Date, ForeignKey, UniqueConstraint, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -14,6 +22,7 @@ from app.database import Base
 
 class Kpi(Base):
     __tablename__ = "kpis"
+    __mapper_args__ = {"eager_defaults": True}
     
     # Primary key
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -73,10 +82,15 @@ class Kpi(Base):
     # Constraints
     __table_args__ = (
         UniqueConstraint('parcel_id', 'observation_date', name='unique_parcel_date'),
+        # Último KPI / serie temporal por parcela (cubre las columnas del dashboard)
+        Index(
+            "ix_kpi_parcel_date_desc", "parcel_id", text("observation_date DESC"),
+            postgresql_include=["ndvi_mean", "ndwi_mean", "stress_area_pct"],
+        ),
     )
     
     # Relationships
-    parcel = relationship("Parcel", back_populates="kpis")
+    parcel = relationship("Parcel", back_populates="kpis", foreign_keys=[parcel_id])
     job = relationship("Job", back_populates="kpis")
     
     def __repr__(self):
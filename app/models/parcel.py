@@ -1,8 +1,105 @@
 """
 Mu.Orbita API - Parcel Model
+
+MIGRACIÓN SQL (ejecutar en Neon, fuera de transacción):
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_parcel_client_active
+        ON parcels (client_id, is_active);
+
+    -- Bounds del ROI precalculados por trigger (sin PostGIS): los endpoints
+    -- de mapa leen las columnas en lugar de recorrer el polígono en Python.
+    ALTER TABLE parcels
+        ADD COLUMN IF NOT EXISTS bounds_south NUMERIC(9, 6),
+        ADD COLUMN IF NOT EXISTS bounds_west  NUMERIC(9, 6),
+        ADD COLUMN IF NOT EXISTS bounds_north NUMERIC(9, 6),
+        ADD COLUMN IF NOT EXISTS bounds_east  NUMERIC(9, 6);
+
+    CREATE OR REPLACE FUNCTION parcels_set_roi_bounds() RETURNS trigger AS $$
+    DECLARE
+        g jsonb := NEW.roi_geojson;
+    BEGIN
+        IF jsonb_typeof(g) = 'string' THEN
+            g := (g #>> '{}')::jsonb;
+        END IF;
+        IF g->>'type' = 'Feature' THEN
+            g := g->'geometry';
+        ELSIF g->>'type' = 'FeatureCollection' THEN
+            g := g->'features'->0->'geometry';
+        END IF;
+
+        SELECT min((pt->>1)::numeric), min((pt->>0)::numeric),
+               max((pt->>1)::numeric), max((pt->>0)::numeric)
+          INTO NEW.bounds_south, NEW.bounds_west, NEW.bounds_north, NEW.bounds_east
+          FROM jsonb_path_query(
+                   g,
+                   CASE WHEN g->>'type' = 'MultiPolygon'
+                        THEN '$.coordinates[*][0][*]'
+                        ELSE '$.coordinates[0][*]' END::jsonpath
+               ) AS pt;
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER trg_parcels_roi_bounds
+        BEFORE INSERT OR UPDATE OF roi_geojson ON parcels
+        FOR EACH ROW EXECUTE FUNCTION parcels_set_roi_bounds();
+
+    -- Backfill (el trigger recalcula al reescribir roi_geojson)
+    UPDATE parcels SET roi_geojson = roi_geojson;
+
+    -- Puntero al último KPI (desnormalizado): el "último KPI de la parcela"
+    -- pasa a ser un JOIN por PK en lugar de ORDER BY ... LIMIT 1.
+    ALTER TABLE parcels ADD COLUMN IF NOT EXISTS latest_kpi_id UUID;
+    ALTER TABLE parcels ADD CONSTRAINT fk_parcels_latest_kpi
+        FOREIGN KEY (latest_kpi_id) REFERENCES kpis (id) ON DELETE SET NULL;
+
+    CREATE OR REPLACE FUNCTION kpis_set_parcel_latest() RETURNS trigger AS $$
+    BEGIN
+        UPDATE parcels p
+           SET latest_kpi_id = NEW.id
+         WHERE p.id = NEW.parcel_id
+           AND NOT EXISTS (
+               SELECT 1 FROM kpis k
+                WHERE k.id = p.latest_kpi_id
+                  AND k.observation_date >= NEW.observation_date
+           );
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION kpis_reset_parcel_latest() RETURNS trigger AS $$
+    BEGIN
+        UPDATE parcels p
+           SET latest_kpi_id = (
+               SELECT k.id FROM kpis k
+                WHERE k.parcel_id = p.id
+                ORDER BY k.observation_date DESC
+                LIMIT 1
+           )
+         WHERE p.id = OLD.parcel_id AND p.latest_kpi_id IS NULL;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER trg_kpis_parcel_latest
+        AFTER INSERT ON kpis
+        FOR EACH ROW EXECUTE FUNCTION kpis_set_parcel_latest();
+
+    -- El FK ya dejó latest_kpi_id a NULL si se borró el último
+    CREATE TRIGGER trg_kpis_parcel_latest_reset
+        AFTER DELETE ON kpis
+        FOR EACH ROW EXECUTE FUNCTION kpis_reset_parcel_latest();
+
+    -- Backfill
+    UPDATE parcels p
+       SET latest_kpi_id = (
+           SELECT k.id FROM kpis k
+            WHERE k.parcel_id = p.id
+            ORDER BY k.observation_date DESC
+            LIMIT 1
+       );
 """
 
-from sqlalchemy import Column, String, Numeric, Boolean, DateTime, Integer, ForeignKey
+from sqlalchemy import FetchedValue, Column, String, Numeric, Boolean, DateTime, Integer, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -13,6 +110,10 @@ from app.database import Base
 
 class Parcel(Base):
     __tablename__ = "parcels"
+    __table_args__ = (
+        Index("ix_parcel_client_active", "client_id", "is_active"),
+    )
+    __mapper_args__ = {"eager_defaults": True}
     
     # Primary key
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -40,6 +141,18 @@ class Parcel(Base):
     roi_geojson = Column(JSONB, nullable=False)
     centroid_lat = Column(Numeric(9, 6), nullable=True)
     centroid_lon = Column(Numeric(9, 6), nullable=True)
+    # Calculados por el trigger trg_parcels_roi_bounds (ver migración)
+    bounds_south = Column(Numeric(9, 6), nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    bounds_west = Column(Numeric(9, 6), nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    bounds_north = Column(Numeric(9, 6), nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    bounds_east = Column(Numeric(9, 6), nullable=True, server_default=FetchedValue(), server_onupdate=FetchedValue())
+    
+    # Último KPI (mantenido por el trigger trg_kpis_parcel_latest)
+    latest_kpi_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey("kpis.id", ondelete="SET NULL", use_alter=True, name="fk_parcels_latest_kpi"),
+        nullable=True
+    )
     
     # Estado
     is_active = Column(Boolean, default=True)
@@ -49,11 +162,11 @@ class Parcel(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     # Metadata
-    parcel_metadata = Column(JSONB, default={})
+    parcel_metadata = Column(JSONB, default=dict)
     
     # Relationships
     client = relationship("Client", back_populates="parcels")
-    kpis = relationship("Kpi", back_populates="parcel", cascade="all, delete-orphan")
+    kpis = relationship("Kpi", back_populates="parcel", cascade="all, delete-orphan", foreign_keys="Kpi.parcel_id")
     jobs = relationship("Job", back_populates="parcel")
     
     def __repr__(self):
@@ -1,8 +1,12 @@
 """
 Mu.Orbita API - Report Model
 v2.0 - Añadido recommendations_json (JSONB) para seguimiento biweekly
+
+MIGRACIÓN SQL (ejecutar en Neon, fuera de transacción):
+    CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_report_client_generated_desc
+        ON reports (client_id, generated_at DESC);
 """
-from sqlalchemy import Column, String, DateTime, Date, Text, ForeignKey
+from sqlalchemy import Column, String, DateTime, Date, Text, ForeignKey, Index, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -11,6 +15,10 @@ from app.database import Base
 
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        Index("ix_report_client_generated_desc", "client_id", text("generated_at DESC")),
+    )
+    __mapper_args__ = {"eager_defaults": True}
     
     # Primary key
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -48,7 +56,7 @@ class Report(Base):
     opened_at = Column(DateTime(timezone=True), nullable=True)
     
     # Metadata
-    report_metadata = Column(JSONB, default={})
+    report_metadata = Column(JSONB, default=dict)
     
     # Relationships
     job = relationship("Job", back_populates="reports")
@@ -0,0 +1,30 @@
+"""
+Mu.Orbita API - Responses
+Clase de respuesta JSON por defecto de la app (orjson).
+"""
+
+from decimal import Decimal
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY
+
+
+def _orjson_default(obj: Any):
+    # Numeric de SQLAlchemy llega como Decimal: orjson no lo serializa solo
+    if isinstance(obj, Decimal):
+        return float(obj)
+    raise TypeError
+
+
+class MuOrbitaJSONResponse(ORJSONResponse):
+    """
+    ORJSONResponse con arrays/escalares NumPy y Decimal nativos. Todo se
+    serializa en orjson, sin pasar por json.dumps. Los datetime sin zona
+    salen sin offset, igual que en los endpoints con response_model.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_orjson_default, option=ORJSON_OPTIONS)
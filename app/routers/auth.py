@@ -5,10 +5,11 @@ Endpoints de autenticación: login, register, Google OAuth
 
 from fastapi import APIRouter, Depends, HTTPException, status, Response
 from fastapi.responses import RedirectResponse
-from sqlalchemy.orm import Session
-from datetime import datetime
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import timedelta
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models.client import Client
 from app.schemas import (
     LoginRequest, RegisterRequest, TokenResponse, 
@@ -16,26 +17,51 @@ from app.schemas import (
     PasswordChangeRequest
 )
 from app.services.auth import (
-    verify_password, get_password_hash, create_tokens,
+    create_tokens,
     verify_refresh_token, exchange_google_code, 
     get_google_user_info, get_google_auth_url
 )
-from app.dependencies import get_current_client
+from app.services.auth_pool import hash_password, verify
+from app.services.client_cache import invalidate_client
+from app.services.rate_limit import enforce_rate_limit, rate_limit
+from app.services.response_cache import invalidate_client_dashboard
+from app.dependencies import get_current_client, get_full_current_client
 from app.config import settings
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
+# Logins seguidos dentro de esta ventana no vuelven a escribir last_login_at
+LAST_LOGIN_WRITE_INTERVAL = timedelta(minutes=5)
 
-@router.post("/register", response_model=TokenResponse)
+
+def _touch_last_login(client_id):
+    """UPDATE de last_login_at con la hora de la BD, saltado si es reciente"""
+    return (
+        update(Client)
+        .where(
+            Client.id == client_id,
+            or_(
+                Client.last_login_at.is_(None),
+                Client.last_login_at < func.now() - LAST_LOGIN_WRITE_INTERVAL
+            )
+        )
+        .values(last_login_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+
+
+@router.post("/register", response_model=TokenResponse, dependencies=[Depends(rate_limit("register"))])
 async def register(
     request: RegisterRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Registro de nuevo cliente con email/password
     """
     # Verificar que email no exista
-    existing = db.query(Client).filter(Client.email == request.email).first()
+    existing = (await db.execute(
+        select(Client).where(Client.email_matches(request.email)).limit(1)
+    )).scalars().first()
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -45,7 +71,7 @@ async def register(
     # Crear cliente
     client = Client(
         email=request.email,
-        password_hash=get_password_hash(request.password),
+        password_hash=await hash_password(request.password),
         client_name=request.client_name,
         company=request.company,
         phone=request.phone,
@@ -54,8 +80,7 @@ async def register(
     )
     
     db.add(client)
-    db.commit()
-    db.refresh(client)
+    await db.commit()
     
     # Generar tokens
     access_token, refresh_token = create_tokens(str(client.id), client.email)
@@ -67,15 +92,20 @@ async def register(
     )
 
 
-@router.post("/login", response_model=TokenResponse)
+@router.post("/login", response_model=TokenResponse, dependencies=[Depends(rate_limit("login"))])
 async def login(
     request: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Login con email/password
     """
-    client = db.query(Client).filter(Client.email == request.email).first()
+    # Además del límite por IP, límite por cuenta (ataques distribuidos)
+    await enforce_rate_limit("login-email", request.email.lower())
+    
+    client = (await db.execute(
+        select(Client).where(Client.email_matches(request.email)).limit(1)
+    )).scalars().first()
     
     if not client:
         raise HTTPException(
@@ -89,15 +119,15 @@ async def login(
             detail="Esta cuenta usa Google para iniciar sesión"
         )
     
-    if not verify_password(request.password, client.password_hash):
+    if not await verify(request.password, client.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email o contraseña incorrectos"
         )
     
     # Actualizar last_login
-    client.last_login_at = datetime.utcnow()
-    db.commit()
+    await db.execute(_touch_last_login(client.id))
+    await db.commit()
     
     # Generar tokens
     access_token, refresh_token = create_tokens(str(client.id), client.email)
@@ -122,7 +152,7 @@ async def google_login():
 @router.get("/google/callback")
 async def google_callback(
     code: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Callback de Google OAuth.
@@ -151,9 +181,11 @@ async def google_callback(
     avatar = user_info.get("picture")
     
     # Buscar cliente existente por google_id o email
-    client = db.query(Client).filter(
-        (Client.google_id == google_id) | (Client.email == email)
-    ).first()
+    client = (await db.execute(
+        select(Client).where(
+            (Client.google_id == google_id) | Client.email_matches(email)
+        ).limit(1)
+    )).scalars().first()
     
     if client:
         # Actualizar datos de Google si es necesario
@@ -161,8 +193,8 @@ async def google_callback(
             client.google_id = google_id
         if avatar:
             client.avatar_url = avatar
-        client.last_login_at = datetime.utcnow()
-        db.commit()
+        await db.execute(_touch_last_login(client.id))
+        await db.commit()
     else:
         # Crear nuevo cliente
         client = Client(
@@ -174,8 +206,7 @@ async def google_callback(
             source="google_oauth",
         )
         db.add(client)
-        db.commit()
-        db.refresh(client)
+        await db.commit()
     
     # Generar tokens
     access_token, refresh_token = create_tokens(str(client.id), client.email)
@@ -193,7 +224,7 @@ async def google_callback(
 @router.post("/google/token", response_model=TokenResponse)
 async def google_token(
     request: GoogleAuthRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Alternativa al callback: el frontend envía el code directamente.
@@ -222,17 +253,19 @@ async def google_token(
     avatar = user_info.get("picture")
     
     # Buscar o crear cliente
-    client = db.query(Client).filter(
-        (Client.google_id == google_id) | (Client.email == email)
-    ).first()
+    client = (await db.execute(
+        select(Client).where(
+            (Client.google_id == google_id) | Client.email_matches(email)
+        ).limit(1)
+    )).scalars().first()
     
     if client:
         if not client.google_id:
             client.google_id = google_id
         if avatar:
             client.avatar_url = avatar
-        client.last_login_at = datetime.utcnow()
-        db.commit()
+        await db.execute(_touch_last_login(client.id))
+        await db.commit()
     else:
         client = Client(
             email=email,
@@ -243,8 +276,7 @@ async def google_token(
             source="google_oauth",
         )
         db.add(client)
-        db.commit()
-        db.refresh(client)
+        await db.commit()
     
     # Generar tokens
     access_token, refresh_token = create_tokens(str(client.id), client.email)
@@ -256,10 +288,10 @@ async def google_token(
     )
 
 
-@router.post("/refresh", response_model=TokenResponse)
+@router.post("/refresh", response_model=TokenResponse, dependencies=[Depends(rate_limit("refresh"))])
 async def refresh_token(
     refresh_token: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Renueva tokens usando refresh token
@@ -272,7 +304,9 @@ async def refresh_token(
         )
     
     client_id = payload.get("sub")
-    client = db.query(Client).filter(Client.id == client_id).first()
+    client = (await db.execute(
+        select(Client).where(Client.id == client_id).limit(1)
+    )).scalars().first()
     
     if not client:
         raise HTTPException(
@@ -303,8 +337,8 @@ async def get_me(
 @router.put("/me", response_model=ClientResponse)
 async def update_profile(
     request: dict,
-    current_client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db)
+    current_client: Client = Depends(get_full_current_client),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Actualiza datos del perfil del cliente autenticado.
@@ -317,18 +351,19 @@ async def update_profile(
         if field in request and request[field] is not None:
             setattr(current_client, field, request[field])
     
-    current_client.updated_at = datetime.utcnow()
-    db.commit()
-    db.refresh(current_client)
+    # updated_at lo pone la BD (onupdate=func.now())
+    await db.commit()
+    invalidate_client(current_client.id)
+    await invalidate_client_dashboard(current_client.id)
     
     return current_client
 
 
-@router.post("/change-password", response_model=MessageResponse)
+@router.post("/change-password", response_model=MessageResponse, dependencies=[Depends(rate_limit("change-password"))])
 async def change_password(
     request: PasswordChangeRequest,
-    current_client: Client = Depends(get_current_client),
-    db: Session = Depends(get_db)
+    current_client: Client = Depends(get_full_current_client),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Cambia la contraseña del cliente autenticado
@@ -339,14 +374,15 @@ async def change_password(
             detail="Esta cuenta usa Google para iniciar sesión. No se puede cambiar la contraseña."
         )
     
-    if not verify_password(request.current_password, current_client.password_hash):
+    if not await verify(request.current_password, current_client.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Contraseña actual incorrecta"
         )
     
-    current_client.password_hash = get_password_hash(request.new_password)
-    db.commit()
+    current_client.password_hash = await hash_password(request.new_password)
+    await db.commit()
+    invalidate_client(current_client.id)
     
     return MessageResponse(message="Contraseña actualizada correctamente")
 
@@ -360,4 +396,5 @@ async def logout(
     El frontend debe eliminar los tokens.
     """
     # Podrías implementar una blacklist de tokens aquí si quieres
+    invalidate_client(current_client.id)
     return MessageResponse(message="Sesión cerrada correctamente")
@@ -14,28 +14,40 @@ CAMBIOS vs v1.x:
   7. NEW:  Modelos Pydantic extendidos definidos inline (no rompe schemas.py)
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.responses import StreamingResponse, RedirectResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse, RedirectResponse
+from starlette.background import BackgroundTask
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import raiseload
+from sqlalchemy import Float, Numeric, and_, bindparam, cast, func, desc, lambda_stmt, select, text, true
 from typing import List, Optional, Any
 from datetime import date, datetime, timedelta
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from uuid import UUID
 import json
+import logging
 import uuid
 import httpx
+import numpy as np
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import Client, Parcel, Job, Kpi, Report
-from app.models.gee_image import GEEImage
 from app.schemas import (
     DashboardSummary, DashboardAlert,
     ParcelResponse, ParcelWithLatestKpi, ParcelCreate, ParcelUpdate,
     KpiResponse, KpiTimeSeries,
-    JobResponse, ReportResponse
+    JobResponse, ReportResponse, construct_from_row
 )
 from app.dependencies import get_current_client, get_current_active_client
+from app.services.http_client import get_http_client
+from app.services.pdf_cache import PDF_CHUNK_SIZE, get_cached_pdf, pdf_cache_path, stream_and_cache
+from app.services.response_cache import (
+    DASHBOARD_CACHE_TTL_SECONDS, dashboard_cache_key, get_cached_response,
+    set_cached_response, invalidate_client_dashboard, json_response_with_etag,
+)
+
+logger = logging.getLogger("muorbita")
 
 router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
 
@@ -58,6 +70,31 @@ class KpiTimeSeriesV2(BaseModel):
     tmax_mean: Optional[float] = None
     precip_mm: Optional[float] = None
 
+    class Config:
+        from_attributes = True
+        frozen = True
+
+
+def _float_column(column, label: Optional[str] = None):
+    """
+    Numeric -> float8 en la propia query: asyncpg devuelve float y no se
+    crean Decimal por fila que luego haya que convertir en Python.
+    """
+    return cast(column, Float).label(label or column.key)
+
+
+def _as_float_columns(columns):
+    return tuple(
+        _float_column(column) if isinstance(column.type, Numeric) else column
+        for column in columns
+    )
+
+
+# Columnas de kpis que expone KpiTimeSeriesV2 (sin cargar la fila entera)
+_KPI_TIMESERIES_COLUMNS = _as_float_columns(
+    getattr(Kpi, field) for field in KpiTimeSeriesV2.model_fields
+)
+
 
 class DashboardSummaryV2(BaseModel):
     """Summary extendido con deltas, EVI, risk levels"""
@@ -90,6 +127,9 @@ class DashboardSummaryV2(BaseModel):
     risk_thermal_level: Optional[str] = None            # NEW
     risk_heterogeneity_level: Optional[str] = None      # NEW
 
+    class Config:
+        frozen = True
+
 
 class RecommendationItem(BaseModel):
     """Recomendación individual del informe"""
@@ -108,6 +148,9 @@ class RecommendationsResponse(BaseModel):
     report_date: Optional[str] = None
     report_id: Optional[str] = None
 
+    class Config:
+        frozen = True
+
 
 class ClimateSummaryResponse(BaseModel):
     """Resumen climático de las últimas semanas"""
@@ -118,6 +161,9 @@ class ClimateSummaryResponse(BaseModel):
     lst_mean: Optional[float] = None
     observations_count: int = 0
 
+    class Config:
+        frozen = True
+
 
 # ============================================================================
 # HELPER: Parsear GeoJSON (puede venir como string o dict)
@@ -157,50 +203,177 @@ def extract_geometry(geojson):
     return None
 
 
-def calculate_bounds(geometry):
-    """Calcula bounds de una geometría"""
-    if geometry is None:
+def polygon_centroid(ring) -> Optional[tuple]:
+    """
+    Centroide (lon, lat) de un anillo GeoJSON, vectorizado con NumPy.
+    Usa el centroide por área (shoelace); si el anillo es degenerado
+    (área ~0) cae a la media de los vértices.
+    """
+    try:
+        coords = np.asarray(ring, dtype=np.float64)[:, :2]
+    except (ValueError, IndexError, TypeError):
         return None
-    
-    coords = []
-    geom_type = geometry.get("type")
-    
-    if geom_type == "Polygon":
-        coords = geometry.get("coordinates", [[]])[0]
-    elif geom_type == "MultiPolygon":
-        for polygon in geometry.get("coordinates", []):
-            if polygon:
-                coords.extend(polygon[0])
-    
-    if not coords:
+    if coords.shape[0] == 0:
         return None
-    
-    lngs = [c[0] for c in coords]
-    lats = [c[1] for c in coords]
-    
-    return {
-        "south": min(lats),
-        "west": min(lngs),
-        "north": max(lats),
-        "east": max(lngs)
-    }
+
+    x, y = coords[:, 0], coords[:, 1]
+    x_next, y_next = np.roll(x, -1), np.roll(y, -1)
+    cross = x * y_next - x_next * y
+    area = cross.sum() / 2.0
+    if abs(area) < 1e-12:
+        lon, lat = coords.mean(axis=0)
+    else:
+        lon = ((x + x_next) * cross).sum() / (6.0 * area)
+        lat = ((y + y_next) * cross).sum() / (6.0 * area)
+    return float(lon), float(lat)
+
+
+# ============================================================================
+# HELPER: Último KPI por parcela (JOIN por PK sobre Parcel.latest_kpi_id)
+# ============================================================================
+
+def _parcels_with_latest_kpi_query(client_id):
+    """
+    Columnas de la parcela + último KPI con los nombres de ParcelWithLatestKpi,
+    para construir cada fila directamente (construct_from_row / model_validate).
+    El último KPI sale del puntero latest_kpi_id (trigger en kpis): un JOIN
+    por PK, sin buscar en el histórico.
+    """
+    return (
+        select(
+            *_as_float_columns(Parcel.__table__.columns),
+            _float_column(Kpi.ndvi_mean, "latest_ndvi"),
+            _float_column(Kpi.ndwi_mean, "latest_ndwi"),
+            Kpi.observation_date.label("latest_observation_date"),
+            _float_column(Kpi.stress_area_pct, "stress_area_pct"),
+        )
+        .outerjoin_from(Parcel, Kpi, Kpi.id == Parcel.latest_kpi_id)
+        .where(Parcel.client_id == client_id)
+    )
+
+
+def _alerts_query(client_id):
+    return (
+        select(
+            Parcel.id.label("parcel_id"),
+            Parcel.parcel_name,
+            Kpi.ndvi_mean,
+            Kpi.stress_area_pct,
+            Kpi.created_at,
+        )
+        .join_from(Parcel, Kpi, Kpi.id == Parcel.latest_kpi_id)
+        .where(Parcel.client_id == client_id, Parcel.is_active == True)
+    )
+
+
+# ============================================================================
+# QUERIES PRECOMPILADAS (lambda_stmt + bindparam)
+# Se construyen una vez; SQLAlchemy cachea el SQL compilado y en cada
+# request solo se pasan los parámetros.
+# ============================================================================
+
+_ACTIVE_PARCELS_WITH_KPI_STMT = lambda_stmt(
+    lambda: _parcels_with_latest_kpi_query(bindparam("client_id"))
+    .where(Parcel.is_active == True)
+)
+
+_PARCEL_WITH_KPI_STMT = lambda_stmt(
+    lambda: _parcels_with_latest_kpi_query(bindparam("client_id"))
+    .where(Parcel.id == bindparam("parcel_id"))
+    .limit(1)
+)
+
+# Parcelas activas con su último KPI (INNER JOIN: sin KPI no hay alerta)
+_ALERTS_STMT = lambda_stmt(
+    lambda: _alerts_query(bindparam("client_id"))
+)
+
+_OWNED_PARCEL_STMT = lambda_stmt(
+    lambda: select(Parcel).where(
+        Parcel.id == bindparam("parcel_id"),
+        Parcel.client_id == bindparam("client_id")
+    ).limit(1)
+)
+
+_OWNED_JOB_STMT = lambda_stmt(
+    lambda: select(Job).options(raiseload("*")).where(
+        Job.job_id == bindparam("job_id"),
+        Job.client_id == bindparam("client_id")
+    ).limit(1)
+)
+
+_OWNED_REPORT_STMT = lambda_stmt(
+    lambda: select(Report).where(
+        Report.id == bindparam("report_id"),
+        Report.client_id == bindparam("client_id")
+    ).limit(1)
+)
+
+_OWNED_PARCEL_ID_STMT = lambda_stmt(
+    lambda: select(Parcel.id).where(
+        Parcel.id == bindparam("parcel_id"),
+        Parcel.client_id == bindparam("client_id")
+    ).limit(1)
+)
+
+_KPI_TIMESERIES_STMT = lambda_stmt(
+    lambda: select(*_KPI_TIMESERIES_COLUMNS).where(
+        Kpi.parcel_id == bindparam("parcel_id"),
+        Kpi.observation_date >= bindparam("start_date"),
+        Kpi.observation_date <= bindparam("end_date")
+    ).order_by(Kpi.observation_date)
+)
+
+# Listados de jobs/reports: solo las columnas del schema de respuesta, como
+# filas Core (sin identity map ni instrumentación ORM, y sin relaciones que
+# puedan cargarse en lazy al serializar). Los campos del schema que no son
+# columnas del modelo quedan con su default.
+_JOB_RESPONSE_COLUMNS = _as_float_columns(
+    getattr(Job, field) for field in JobResponse.model_fields if hasattr(Job, field)
+)
+_REPORT_RESPONSE_COLUMNS = _as_float_columns(
+    getattr(Report, field) for field in ReportResponse.model_fields
+)
+
+_JOBS_STMT = lambda_stmt(
+    lambda: select(*_JOB_RESPONSE_COLUMNS)
+    .where(Job.client_id == bindparam("client_id"))
+    .order_by(desc(Job.created_at))
+    .offset(bindparam("offset")).limit(bindparam("limit"))
+)
+
+_JOBS_BY_STATUS_STMT = lambda_stmt(
+    lambda: select(*_JOB_RESPONSE_COLUMNS).where(
+        Job.client_id == bindparam("client_id"),
+        Job.status == bindparam("status")
+    )
+    .order_by(desc(Job.created_at))
+    .offset(bindparam("offset")).limit(bindparam("limit"))
+)
+
+_REPORTS_STMT = lambda_stmt(
+    lambda: select(*_REPORT_RESPONSE_COLUMNS)
+    .where(Report.client_id == bindparam("client_id"))
+    .order_by(desc(Report.generated_at))
+    .offset(bindparam("offset")).limit(bindparam("limit"))
+)
 
 
 # ============================================================================
 # v2.0 HELPER: Extraer risk levels de report_metadata o narratives
 # ============================================================================
 
-def _extract_risk_levels(report: Report) -> dict:
-    """Extrae risk levels del último report (desde report_metadata o recommendations)"""
+def _extract_risk_levels(report_metadata: Optional[dict]) -> dict:
+    """Extrae risk levels del report_metadata del último report"""
     result = {
         "risk_hydric_level": None,
         "risk_thermal_level": None,
         "risk_heterogeneity_level": None,
     }
-    if not report or not report.report_metadata:
+    if not report_metadata:
         return result
 
-    meta = report.report_metadata
+    meta = report_metadata
     # Si el PDF generator guardó los risk levels en metadata
     result["risk_hydric_level"] = meta.get("risk_hydric_level")
     result["risk_thermal_level"] = meta.get("risk_thermal_level")
@@ -214,70 +387,100 @@ def _extract_risk_levels(report: Report) -> dict:
 
 @router.get("/summary", response_model=DashboardSummaryV2)
 async def get_dashboard_summary(
+    request: Request,
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtiene resumen general para el dashboard principal.
     v2.0: incluye deltas vs último informe, EVI, y risk levels.
+    Se cachea ya serializado por cliente (DASHBOARD_CACHE_TTL_SECONDS) con ETag;
+    la ingesta de KPIs/reports y los cambios de parcelas lo invalidan.
     """
-    # Contar parcelas
-    total_parcels = db.query(func.count(Parcel.id)).filter(
-        Parcel.client_id == current_client.id,
-        Parcel.is_active == True
-    ).scalar() or 0
+    client_id = current_client.id
+    cache_key = await dashboard_cache_key(client_id, "summary")
+    cached_body = await get_cached_response(cache_key)
+    if cached_body is not None:
+        return json_response_with_etag(request, cached_body)
     
-    # Sumar hectáreas
-    total_hectares = db.query(func.sum(Parcel.hectares)).filter(
-        Parcel.client_id == current_client.id,
-        Parcel.is_active == True
-    ).scalar() or 0
+    active_parcels = and_(Parcel.client_id == client_id, Parcel.is_active == True)
+    active_parcel_ids = select(Parcel.id).where(active_parcels)
+    ninety_days_ago = date.today() - timedelta(days=90)
+    recent_kpi = and_(
+        Kpi.parcel_id.in_(active_parcel_ids),
+        Kpi.observation_date >= ninety_days_ago
+    )
     
-    # Contar reportes
-    total_reports = db.query(func.count(Report.id)).filter(
-        Report.client_id == current_client.id
-    ).scalar() or 0
+    # Nº de parcelas y hectáreas en un solo recorrido de parcels
+    parcel_totals = select(
+        func.count(Parcel.id).label("total_parcels"),
+        _float_column(func.sum(Parcel.hectares), "total_hectares"),
+    ).where(active_parcels).subquery("parcel_totals")
     
-    # Último análisis
-    last_job = db.query(Job).filter(
-        Job.client_id == current_client.id,
-        Job.status == "completed"
-    ).order_by(desc(Job.completed_at)).first()
+    # KPIs promedio últimos 90 días: un solo recorrido de kpis
+    kpi_averages = select(
+        _float_column(func.avg(Kpi.ndvi_mean), "avg_ndvi"),
+        _float_column(func.avg(Kpi.ndwi_mean), "avg_ndwi"),
+        _float_column(func.avg(Kpi.evi_mean), "avg_evi"),
+        _float_column(func.avg(Kpi.stress_area_pct), "stress_area_pct"),
+    ).where(recent_kpi).subquery("kpi_averages")
     
-    # IDs de parcelas activas
-    parcel_ids = db.query(Parcel.id).filter(
-        Parcel.client_id == current_client.id,
-        Parcel.is_active == True
-    ).all()
-    parcel_ids = [p[0] for p in parcel_ids]
+    # Todos los agregados en una sola fila (agregados + scalar subqueries)
+    summary = select(
+        parcel_totals.c.total_parcels,
+        parcel_totals.c.total_hectares,
+        kpi_averages.c.avg_ndvi,
+        kpi_averages.c.avg_ndwi,
+        kpi_averages.c.avg_evi,
+        kpi_averages.c.stress_area_pct,
+        select(func.count(Report.id)).where(Report.client_id == client_id).scalar_subquery().label("total_reports"),
+        # Último análisis
+        select(Job.completed_at).where(
+            Job.client_id == client_id,
+            Job.status == "completed"
+        ).order_by(desc(Job.completed_at)).limit(1).scalar_subquery().label("last_analysis_date"),
+        # Alertas: último KPI de cada parcela con NDVI < 0.45
+        # (el umbral va en el WHERE: se filtra en el join, no al contar)
+        select(func.count())
+        .select_from(Parcel)
+        .join(Kpi, Kpi.id == Parcel.latest_kpi_id)
+        .where(active_parcels, Kpi.ndvi_mean < 0.45)
+        .scalar_subquery().label("alerts_count"),
+        # v2.0: Risk levels del último report
+        select(Report.report_metadata).where(
+            Report.client_id == client_id,
+            Report.report_type.in_(["baseline", "biweekly"])
+        ).order_by(desc(Report.generated_at)).limit(1).scalar_subquery().label("report_metadata"),
+    ).select_from(parcel_totals.join(kpi_averages, true())).subquery("summary")
     
-    # ── KPIs promedio últimos 90 días ──
-    avg_ndvi = None
-    avg_ndwi = None
-    avg_evi = None
-    stress_area_pct = None
-    if parcel_ids:
-        ninety_days_ago = date.today() - timedelta(days=90)
-        
-        avg_ndvi = db.query(func.avg(Kpi.ndvi_mean)).filter(
-            Kpi.parcel_id.in_(parcel_ids),
-            Kpi.observation_date >= ninety_days_ago
-        ).scalar()
-        
-        avg_ndwi = db.query(func.avg(Kpi.ndwi_mean)).filter(
-            Kpi.parcel_id.in_(parcel_ids),
-            Kpi.observation_date >= ninety_days_ago
-        ).scalar()
-        
-        avg_evi = db.query(func.avg(Kpi.evi_mean)).filter(
-            Kpi.parcel_id.in_(parcel_ids),
-            Kpi.observation_date >= ninety_days_ago
-        ).scalar()
-        
-        stress_area_pct = db.query(func.avg(Kpi.stress_area_pct)).filter(
-            Kpi.parcel_id.in_(parcel_ids),
-            Kpi.observation_date >= ninety_days_ago
-        ).scalar()
+    # v2.0: los 2 últimos KPIs con NDVI (para deltas), unidos a la fila de agregados
+    last_two = (
+        select(*_as_float_columns((Kpi.ndvi_mean, Kpi.ndwi_mean, Kpi.evi_mean, Kpi.stress_area_pct)),
+               Kpi.observation_date, Kpi.id)
+        .where(Kpi.parcel_id.in_(active_parcel_ids), Kpi.ndvi_mean.isnot(None))
+        .order_by(desc(Kpi.observation_date), desc(Kpi.id))
+        .limit(2)
+        .subquery("last_two")
+    )
+    
+    rows = (await db.execute(
+        select(summary, last_two.c.ndvi_mean.label("kpi_ndvi"), last_two.c.ndwi_mean.label("kpi_ndwi"),
+               last_two.c.evi_mean.label("kpi_evi"), last_two.c.stress_area_pct.label("kpi_stress"))
+        .select_from(summary)
+        .outerjoin(last_two, true())
+        .order_by(desc(last_two.c.observation_date), desc(last_two.c.id))
+    )).all()
+    row = rows[0]
+    
+    total_parcels = row.total_parcels or 0
+    total_hectares = row.total_hectares or 0
+    total_reports = row.total_reports or 0
+    avg_ndvi = row.avg_ndvi
+    avg_ndwi = row.avg_ndwi
+    avg_evi = row.avg_evi
+    stress_area_pct = row.stress_area_pct
+    alerts_count = row.alerts_count or 0
+    last_analysis_date = row.last_analysis_date
     
     # ── v2.0: Calcular deltas entre los 2 últimos KPIs ──
     ndvi_delta = None
@@ -286,69 +489,33 @@ async def get_dashboard_summary(
     evi_delta = None
     stress_delta = None
     
-    if parcel_ids:
-        # Últimos 2 KPIs de la primera parcela (ordenados desc)
-        last_two_kpis = db.query(Kpi).filter(
-            Kpi.parcel_id.in_(parcel_ids),
-            Kpi.ndvi_mean.isnot(None)
-        ).order_by(desc(Kpi.observation_date)).limit(2).all()
+    if len(rows) >= 2:
+        curr = rows[0]
+        prev = rows[1]
         
-        if len(last_two_kpis) >= 2:
-            curr = last_two_kpis[0]
-            prev = last_two_kpis[1]
-            
-            if curr.ndvi_mean is not None and prev.ndvi_mean is not None:
-                ndvi_delta = float(curr.ndvi_mean) - float(prev.ndvi_mean)
-                if float(prev.ndvi_mean) > 0:
-                    ndvi_delta_pct = (ndvi_delta / float(prev.ndvi_mean)) * 100
-            
-            if curr.ndwi_mean is not None and prev.ndwi_mean is not None:
-                ndwi_delta = float(curr.ndwi_mean) - float(prev.ndwi_mean)
-            
-            if curr.evi_mean is not None and prev.evi_mean is not None:
-                evi_delta = float(curr.evi_mean) - float(prev.evi_mean)
-            
-            if curr.stress_area_pct is not None and prev.stress_area_pct is not None:
-                stress_delta = float(curr.stress_area_pct) - float(prev.stress_area_pct)
-    
-    # ── Contar alertas ──
-    alerts_count = 0
-    if parcel_ids:
-        latest_kpis = db.query(Kpi).filter(
-            Kpi.parcel_id.in_(parcel_ids)
-        ).order_by(Kpi.parcel_id, desc(Kpi.observation_date)).distinct(Kpi.parcel_id).all()
+        if curr.kpi_ndvi is not None and prev.kpi_ndvi is not None:
+            ndvi_delta = curr.kpi_ndvi - prev.kpi_ndvi
+            if prev.kpi_ndvi > 0:
+                ndvi_delta_pct = (ndvi_delta / prev.kpi_ndvi) * 100
         
-        alerts_count = sum(1 for k in latest_kpis if k.ndvi_mean and k.ndvi_mean < 0.45)
+        if curr.kpi_ndwi is not None and prev.kpi_ndwi is not None:
+            ndwi_delta = curr.kpi_ndwi - prev.kpi_ndwi
+        
+        if curr.kpi_evi is not None and prev.kpi_evi is not None:
+            evi_delta = curr.kpi_evi - prev.kpi_evi
+        
+        if curr.kpi_stress is not None and prev.kpi_stress is not None:
+            stress_delta = curr.kpi_stress - prev.kpi_stress
     
     # ── Días hasta próximo informe ──
     days_until_next = None
-    if last_job and last_job.completed_at:
-        next_report_date = last_job.completed_at + timedelta(days=14)
+    if last_analysis_date:
+        next_report_date = last_analysis_date + timedelta(days=14)
         days_until_next = (next_report_date.date() - date.today()).days
         if days_until_next < 0:
             days_until_next = 0
     
-    # ── Datos fenológicos del último job ──
-    pheno_phase = None
-    pheno_status = None
-    ndvi_expected = None
-    ndvi_deviation_pct = None
-    
-    if last_job:
-        pheno_phase = getattr(last_job, 'pheno_phase', None)
-        pheno_status = getattr(last_job, 'pheno_status', None)
-        ndvi_expected = getattr(last_job, 'ndvi_expected', None)
-        ndvi_deviation_pct = getattr(last_job, 'ndvi_deviation_pct', None)
-    
-    # ── v2.0: Risk levels del último report ──
-    risk_levels = {"risk_hydric_level": None, "risk_thermal_level": None, "risk_heterogeneity_level": None}
-    latest_report = db.query(Report).filter(
-        Report.client_id == current_client.id,
-        Report.report_type.in_(["baseline", "biweekly"])
-    ).order_by(desc(Report.generated_at)).first()
-    
-    if latest_report:
-        risk_levels = _extract_risk_levels(latest_report)
+    risk_levels = _extract_risk_levels(row.report_metadata)
     
     # ── Tendencia NDVI (simple: comparar último vs anterior) ──
     ndvi_trend = "stable"
@@ -358,24 +525,19 @@ async def get_dashboard_summary(
         elif ndvi_delta < -0.02:
             ndvi_trend = "down"
     
-    return DashboardSummaryV2(
+    summary = DashboardSummaryV2(
         client_name=current_client.client_name,
         total_parcels=total_parcels,
-        total_hectares=float(total_hectares),
+        total_hectares=total_hectares,
         total_reports=total_reports,
-        avg_ndvi=round(float(avg_ndvi), 3) if avg_ndvi else None,
-        avg_ndwi=round(float(avg_ndwi), 3) if avg_ndwi else None,
-        avg_evi=round(float(avg_evi), 3) if avg_evi else None,
-        stress_area_pct=round(float(stress_area_pct), 1) if stress_area_pct else None,
+        avg_ndvi=round(avg_ndvi, 3) if avg_ndvi else None,
+        avg_ndwi=round(avg_ndwi, 3) if avg_ndwi else None,
+        avg_evi=round(avg_evi, 3) if avg_evi else None,
+        stress_area_pct=round(stress_area_pct, 1) if stress_area_pct else None,
         ndvi_trend=ndvi_trend,
-        last_analysis_date=last_job.completed_at if last_job else None,
+        last_analysis_date=last_analysis_date,
         days_until_next_report=days_until_next,
         alerts_count=alerts_count,
-        # Fenológicos
-        pheno_phase=pheno_phase,
-        pheno_status=pheno_status,
-        ndvi_expected=float(ndvi_expected) if ndvi_expected else None,
-        ndvi_deviation_pct=float(ndvi_deviation_pct) if ndvi_deviation_pct else None,
         # v2.0: Deltas
         ndvi_delta=round(ndvi_delta, 3) if ndvi_delta is not None else None,
         ndvi_delta_pct=round(ndvi_delta_pct, 1) if ndvi_delta_pct is not None else None,
@@ -385,6 +547,10 @@ async def get_dashboard_summary(
         # v2.0: Risk levels
         **risk_levels,
     )
+    
+    body = summary.model_dump_json().encode()
+    await set_cached_response(cache_key, body, DASHBOARD_CACHE_TTL_SECONDS)
+    return json_response_with_etag(request, body)
 
 
 # ============================================================================
@@ -394,55 +560,25 @@ async def get_dashboard_summary(
 @router.get("/parcels", response_model=List[ParcelWithLatestKpi])
 async def get_parcels(
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtiene todas las parcelas del cliente con su último KPI
     """
-    parcels = db.query(Parcel).filter(
-        Parcel.client_id == current_client.id,
-        Parcel.is_active == True
-    ).all()
+    # Parcelas + último KPI de cada una en una sola query (sin N+1).
+    rows = (await db.execute(
+        _ACTIVE_PARCELS_WITH_KPI_STMT, {"client_id": current_client.id}
+    )).all()
     
-    result = []
-    for parcel in parcels:
-        latest_kpi = db.query(Kpi).filter(
-            Kpi.parcel_id == parcel.id
-        ).order_by(desc(Kpi.observation_date)).first()
-        
-        parcel_data = ParcelWithLatestKpi(
-            id=parcel.id,
-            client_id=parcel.client_id,
-            parcel_name=parcel.parcel_name,
-            parcel_code=parcel.parcel_code,
-            hectares=float(parcel.hectares),
-            crop_type=parcel.crop_type,
-            crop_variety=parcel.crop_variety,
-            planting_year=parcel.planting_year,
-            irrigation_type=parcel.irrigation_type,
-            location_name=parcel.location_name,
-            municipality=parcel.municipality,
-            province=parcel.province,
-            roi_geojson=parcel.roi_geojson,
-            is_active=parcel.is_active,
-            centroid_lat=float(parcel.centroid_lat) if parcel.centroid_lat else None,
-            centroid_lon=float(parcel.centroid_lon) if parcel.centroid_lon else None,
-            created_at=parcel.created_at,
-            latest_ndvi=float(latest_kpi.ndvi_mean) if latest_kpi and latest_kpi.ndvi_mean else None,
-            latest_ndwi=float(latest_kpi.ndwi_mean) if latest_kpi and latest_kpi.ndwi_mean else None,
-            latest_observation_date=latest_kpi.observation_date if latest_kpi else None,
-            stress_area_pct=float(latest_kpi.stress_area_pct) if latest_kpi and latest_kpi.stress_area_pct else None
-        )
-        result.append(parcel_data)
-    
-    return result
+    # Fuente de confianza (BD, Numeric ya casteado a float): sin validar por fila
+    return [construct_from_row(ParcelWithLatestKpi, row) for row in rows]
 
 
 @router.post("/parcels", response_model=ParcelResponse)
 async def create_parcel(
     parcel: ParcelCreate,
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Crea una nueva parcela para el cliente"""
     centroid_lat = None
@@ -454,11 +590,9 @@ async def create_parcel(
         
         if geometry and geometry.get("coordinates"):
             coords = geometry["coordinates"][0] if geometry["type"] == "Polygon" else geometry["coordinates"][0][0]
-            if coords:
-                lats = [c[1] for c in coords]
-                lons = [c[0] for c in coords]
-                centroid_lat = sum(lats) / len(lats)
-                centroid_lon = sum(lons) / len(lons)
+            centroid = polygon_centroid(coords)
+            if centroid:
+                centroid_lon, centroid_lat = centroid
     
     new_parcel = Parcel(
         client_id=current_client.id,
@@ -478,8 +612,8 @@ async def create_parcel(
     )
     
     db.add(new_parcel)
-    db.commit()
-    db.refresh(new_parcel)
+    await db.commit()
+    await invalidate_client_dashboard(current_client.id)
     
     return new_parcel
 
@@ -488,44 +622,17 @@ async def create_parcel(
 async def get_parcel(
     parcel_id: str,
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtiene detalle de una parcela específica"""
-    parcel = db.query(Parcel).filter(
-        Parcel.id == parcel_id,
-        Parcel.client_id == current_client.id
-    ).first()
+    row = (await db.execute(
+        _PARCEL_WITH_KPI_STMT, {"client_id": current_client.id, "parcel_id": parcel_id}
+    )).first()
     
-    if not parcel:
+    if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcela no encontrada")
     
-    latest_kpi = db.query(Kpi).filter(
-        Kpi.parcel_id == parcel.id
-    ).order_by(desc(Kpi.observation_date)).first()
-    
-    return ParcelWithLatestKpi(
-        id=parcel.id,
-        client_id=parcel.client_id,
-        parcel_name=parcel.parcel_name,
-        parcel_code=parcel.parcel_code,
-        hectares=float(parcel.hectares),
-        crop_type=parcel.crop_type,
-        crop_variety=parcel.crop_variety,
-        planting_year=parcel.planting_year,
-        irrigation_type=parcel.irrigation_type,
-        location_name=parcel.location_name,
-        municipality=parcel.municipality,
-        province=parcel.province,
-        roi_geojson=parcel.roi_geojson,
-        is_active=parcel.is_active,
-        centroid_lat=float(parcel.centroid_lat) if parcel.centroid_lat else None,
-        centroid_lon=float(parcel.centroid_lon) if parcel.centroid_lon else None,
-        created_at=parcel.created_at,
-        latest_ndvi=float(latest_kpi.ndvi_mean) if latest_kpi and latest_kpi.ndvi_mean else None,
-        latest_ndwi=float(latest_kpi.ndwi_mean) if latest_kpi and latest_kpi.ndwi_mean else None,
-        latest_observation_date=latest_kpi.observation_date if latest_kpi else None,
-        stress_area_pct=float(latest_kpi.stress_area_pct) if latest_kpi and latest_kpi.stress_area_pct else None
-    )
+    return ParcelWithLatestKpi.model_validate(row)
 
 
 @router.patch("/parcels/{parcel_id}", response_model=ParcelResponse)
@@ -533,13 +640,12 @@ async def update_parcel(
     parcel_id: str,
     parcel_update: ParcelUpdate,
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Actualiza una parcela"""
-    parcel = db.query(Parcel).filter(
-        Parcel.id == parcel_id,
-        Parcel.client_id == current_client.id
-    ).first()
+    parcel = (await db.execute(
+        _OWNED_PARCEL_STMT, {"parcel_id": parcel_id, "client_id": current_client.id}
+    )).scalars().first()
     
     if not parcel:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcela no encontrada")
@@ -548,8 +654,8 @@ async def update_parcel(
     for field, value in update_data.items():
         setattr(parcel, field, value)
     
-    db.commit()
-    db.refresh(parcel)
+    await db.commit()
+    await invalidate_client_dashboard(current_client.id)
     
     return parcel
 
@@ -558,19 +664,19 @@ async def update_parcel(
 async def delete_parcel(
     parcel_id: str,
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Desactiva una parcela (soft delete)"""
-    parcel = db.query(Parcel).filter(
-        Parcel.id == parcel_id,
-        Parcel.client_id == current_client.id
-    ).first()
+    parcel = (await db.execute(
+        _OWNED_PARCEL_STMT, {"parcel_id": parcel_id, "client_id": current_client.id}
+    )).scalars().first()
     
     if not parcel:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcela no encontrada")
     
     parcel.is_active = False
-    db.commit()
+    await db.commit()
+    await invalidate_client_dashboard(current_client.id)
     
     return {"message": "Parcela desactivada correctamente"}
 
@@ -585,49 +691,31 @@ async def get_parcel_kpis(
     start_date: Optional[date] = Query(None),
     end_date: Optional[date] = Query(None),
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtiene serie temporal de KPIs de una parcela (para gráficas).
     v2.0: ahora incluye evi_mean, lst_mean, tmax_mean, precip_mm.
     """
-    parcel = db.query(Parcel).filter(
-        Parcel.id == parcel_id,
-        Parcel.client_id == current_client.id
-    ).first()
+    owned = (await db.execute(
+        _OWNED_PARCEL_ID_STMT, {"parcel_id": parcel_id, "client_id": current_client.id}
+    )).first()
     
-    if not parcel:
+    if not owned:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcela no encontrada")
     
-    query = db.query(Kpi).filter(Kpi.parcel_id == parcel_id)
-    
-    if start_date:
-        query = query.filter(Kpi.observation_date >= start_date)
-    if end_date:
-        query = query.filter(Kpi.observation_date <= end_date)
-    
-    # Por defecto, último año
+    # Por defecto, último año. Sin límite por un lado -> date.min / date.max
     if not start_date and not end_date:
-        one_year_ago = date.today() - timedelta(days=365)
-        query = query.filter(Kpi.observation_date >= one_year_ago)
+        start_date = date.today() - timedelta(days=365)
     
-    kpis = query.order_by(Kpi.observation_date).all()
+    rows = (await db.execute(_KPI_TIMESERIES_STMT, {
+        "parcel_id": parcel_id,
+        "start_date": start_date or date.min,
+        "end_date": end_date or date.max,
+    })).all()
     
-    return [
-        KpiTimeSeriesV2(
-            observation_date=k.observation_date,
-            ndvi_mean=float(k.ndvi_mean) if k.ndvi_mean else None,
-            ndvi_p10=float(k.ndvi_p10) if k.ndvi_p10 else None,
-            ndvi_p90=float(k.ndvi_p90) if k.ndvi_p90 else None,
-            ndwi_mean=float(k.ndwi_mean) if k.ndwi_mean else None,
-            evi_mean=float(k.evi_mean) if k.evi_mean else None,          # ← FIX: antes faltaba
-            stress_area_pct=float(k.stress_area_pct) if k.stress_area_pct else None,
-            lst_mean=float(k.lst_mean) if k.lst_mean else None,          # ← NEW
-            tmax_mean=float(k.tmax_mean) if k.tmax_mean else None,       # ← NEW
-            precip_mm=float(k.precip_mm) if k.precip_mm else None,       # ← NEW
-        )
-        for k in kpis
-    ]
+    # Fuente de confianza (BD): _KPI_TIMESERIES_COLUMNS ya castea a float
+    return [construct_from_row(KpiTimeSeriesV2, row) for row in rows]
 
 
 # ============================================================================
@@ -640,27 +728,30 @@ async def get_jobs(
     limit: int = Query(20, le=100),
     offset: int = Query(0),
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtiene historial de jobs del cliente"""
-    query = db.query(Job).filter(Job.client_id == current_client.id)
+    params = {"client_id": current_client.id, "offset": offset, "limit": limit}
     if status:
-        query = query.filter(Job.status == status)
-    jobs = query.order_by(desc(Job.created_at)).offset(offset).limit(limit).all()
-    return jobs
+        stmt = _JOBS_BY_STATUS_STMT
+        params["status"] = status
+    else:
+        stmt = _JOBS_STMT
+    rows = (await db.execute(stmt, params)).all()
+    # Fuente de confianza (BD): la validación la hace una vez el response_model
+    return [construct_from_row(JobResponse, row) for row in rows]
 
 
 @router.get("/jobs/{job_id}", response_model=JobResponse)
 async def get_job(
     job_id: str,
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtiene detalle de un job específico"""
-    job = db.query(Job).filter(
-        Job.job_id == job_id,
-        Job.client_id == current_client.id
-    ).first()
+    job = (await db.execute(
+        _OWNED_JOB_STMT, {"job_id": job_id, "client_id": current_client.id}
+    )).scalars().first()
     if not job:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job no encontrado")
     return job
@@ -675,54 +766,85 @@ async def get_reports(
     limit: int = Query(20, le=100),
     offset: int = Query(0),
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtiene historial de reportes del cliente"""
-    reports = db.query(Report).filter(
-        Report.client_id == current_client.id
-    ).order_by(desc(Report.generated_at)).offset(offset).limit(limit).all()
-    return reports
+    rows = (await db.execute(_REPORTS_STMT, {
+        "client_id": current_client.id, "offset": offset, "limit": limit
+    })).all()
+    # Fuente de confianza (BD): la validación la hace una vez el response_model
+    return [construct_from_row(ReportResponse, row) for row in rows]
 
 
 @router.get("/reports/{report_id}/download")
 async def download_report(
     report_id: str,
     current_client: Client = Depends(get_current_active_client),   # ← FIX: ahora requiere auth
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Descarga un reporte. v2.0: requiere autenticación.
     FIX: Para biweekly, si pdf_url no existe, intentar reconstruir la URL de Drive.
+    El PDF se hace streaming a través de la API (sin redirigir al navegador
+    a Drive ni cargarlo entero en memoria) y se guarda en la cache de disco:
+    las siguientes descargas no tocan Drive.
     """
     try:
         report_uuid = uuid.UUID(report_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="ID de reporte inválido")
 
-    report = db.query(Report).filter(
-        Report.id == report_uuid,
-        Report.client_id == current_client.id           # ← FIX: verificar que es del cliente
-    ).first()
+    # ← FIX: verificar que es del cliente
+    report = (await db.execute(
+        _OWNED_REPORT_STMT, {"report_id": report_uuid, "client_id": current_client.id}
+    )).scalars().first()
 
     if not report:
         raise HTTPException(status_code=404, detail="Reporte no encontrado")
 
-    if not report.pdf_url:
+    if report.pdf_url:
+        pdf_url = report.pdf_url
+        if 'drive.google.com/file/d/' in pdf_url:
+            file_id = pdf_url.split('/file/d/')[1].split('/')[0]
+            pdf_url = f"https://drive.google.com/uc?export=download&id={file_id}"
+    elif report.pdf_drive_id:
         # v2.0: Si no tiene pdf_url, intentar con pdf_drive_id
-        if report.pdf_drive_id:
-            pdf_url = f"https://drive.google.com/uc?export=download&id={report.pdf_drive_id}"
-            return {"url": pdf_url}
+        pdf_url = f"https://drive.google.com/uc?export=download&id={report.pdf_drive_id}"
+    else:
         raise HTTPException(
             status_code=404,
             detail="PDF no disponible. El reporte puede estar procesándose — inténtalo de nuevo en unos minutos."
         )
 
-    pdf_url = report.pdf_url
-    if 'drive.google.com/file/d/' in pdf_url:
-        file_id = pdf_url.split('/file/d/')[1].split('/')[0]
-        pdf_url = f"https://drive.google.com/uc?export=download&id={file_id}"
+    filename = f"{report.id}.pdf"
+    cache_path = pdf_cache_path(report.id, pdf_url)
+    cached = await get_cached_pdf(cache_path)
+    if cached is not None:
+        return FileResponse(cached, media_type="application/pdf", filename=filename)
 
-    return {"url": pdf_url}
+    http = get_http_client()
+    try:
+        upstream = await http.send(http.build_request("GET", pdf_url), stream=True)
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail="No se pudo descargar el PDF")
+
+    # Drive responde 200 con una página HTML (aviso de antivirus, cuota
+    # excedida) en vez del fichero: eso no es un PDF
+    content_type = upstream.headers.get("content-type", "")
+    if upstream.status_code != 200 or content_type.startswith("text/html"):
+        await upstream.aclose()
+        raise HTTPException(status_code=502, detail="No se pudo descargar el PDF")
+
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if "content-length" in upstream.headers and "content-encoding" not in upstream.headers:
+        headers["Content-Length"] = upstream.headers["content-length"]
+
+    return StreamingResponse(
+        stream_and_cache(upstream.aiter_bytes(PDF_CHUNK_SIZE), cache_path),
+        media_type="application/pdf",
+        headers=headers,
+        background=BackgroundTask(upstream.aclose),
+    )
 
 
 # ============================================================================
@@ -740,38 +862,43 @@ class ReportLinkCreate(BaseModel):
 @router.post("/reports/register")
 async def create_report_link(
     data: ReportLinkCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Crea o actualiza registro de reporte con link de Google Drive (llamado desde n8n).
     UPSERT: si job-completed ya creó el report, solo actualiza pdf_url/pdf_drive_id.
     """
-    job = db.query(Job).filter(Job.job_id == data.job_id_string).first()
+    job = (await db.execute(
+        select(Job).where(Job.job_id == data.job_id_string).limit(1)
+    )).scalars().first()
     if not job:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Job no encontrado: {data.job_id_string}"
         )
     
-    client = db.query(Client).filter(Client.email == data.client_email).first()
+    client = (await db.execute(
+        select(Client).where(Client.email_matches(data.client_email)).limit(1)
+    )).scalars().first()
     if not client:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Cliente no encontrado: {data.client_email}"
         )
     
-    existing_report = db.query(Report).filter(
-        Report.job_id == job.id
-    ).first()
+    existing_report = (await db.execute(
+        select(Report).where(
+            Report.job_id == job.id
+        ).limit(1)
+    )).scalars().first()
     
     if existing_report:
         if data.pdf_url:
             existing_report.pdf_url = data.pdf_url
         if data.pdf_drive_id:
             existing_report.pdf_drive_id = data.pdf_drive_id
-        db.commit()
-        db.refresh(existing_report)
-        print(f"📝 Report actualizado con Drive URL para job {data.job_id_string}")
+        await db.commit()
+        logger.info("📝 Report actualizado con Drive URL para job %s", data.job_id_string)
         return {
             "success": True,
             "report_id": str(existing_report.id),
@@ -787,8 +914,8 @@ async def create_report_link(
     )
     
     db.add(new_report)
-    db.commit()
-    db.refresh(new_report)
+    await db.commit()
+    await invalidate_client_dashboard(client.id)
     
     return {
         "success": True,
@@ -802,30 +929,30 @@ async def create_report_link(
 # ALERTS  (sin cambios)
 # ============================================================================
 
+_ALERTS_ADAPTER = TypeAdapter(List[DashboardAlert])
+
+
 @router.get("/alerts", response_model=List[DashboardAlert])
 async def get_alerts(
+    request: Request,
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Obtiene alertas activas (parcelas con estrés)"""
-    parcels = db.query(Parcel).filter(
-        Parcel.client_id == current_client.id,
-        Parcel.is_active == True
-    ).all()
+    """Obtiene alertas activas (parcelas con estrés). Cacheado como /summary."""
+    cache_key = await dashboard_cache_key(current_client.id, "alerts")
+    cached_body = await get_cached_response(cache_key)
+    if cached_body is not None:
+        return json_response_with_etag(request, cached_body)
+    
+    # Último KPI de cada parcela activa en una sola query (sin N+1)
+    rows = (await db.execute(_ALERTS_STMT, {"client_id": current_client.id})).all()
     
     alerts = []
-    for parcel in parcels:
-        latest_kpi = db.query(Kpi).filter(
-            Kpi.parcel_id == parcel.id
-        ).order_by(desc(Kpi.observation_date)).first()
-        
-        if not latest_kpi:
-            continue
-        
+    for latest_kpi in rows:
         if latest_kpi.ndvi_mean and latest_kpi.ndvi_mean < 0.35:
             alerts.append(DashboardAlert(
-                parcel_id=parcel.id,
-                parcel_name=parcel.parcel_name,
+                parcel_id=latest_kpi.parcel_id,
+                parcel_name=latest_kpi.parcel_name,
                 alert_type="stress",
                 severity="critical",
                 message=f"NDVI crítico: {latest_kpi.ndvi_mean:.2f}. Requiere inspección inmediata.",
@@ -833,8 +960,8 @@ async def get_alerts(
             ))
         elif latest_kpi.ndvi_mean and latest_kpi.ndvi_mean < 0.45:
             alerts.append(DashboardAlert(
-                parcel_id=parcel.id,
-                parcel_name=parcel.parcel_name,
+                parcel_id=latest_kpi.parcel_id,
+                parcel_name=latest_kpi.parcel_name,
                 alert_type="low_vigor",
                 severity="warning",
                 message=f"NDVI bajo: {latest_kpi.ndvi_mean:.2f}. Monitorizar evolución.",
@@ -843,15 +970,17 @@ async def get_alerts(
         
         if latest_kpi.stress_area_pct and latest_kpi.stress_area_pct > 20:
             alerts.append(DashboardAlert(
-                parcel_id=parcel.id,
-                parcel_name=parcel.parcel_name,
+                parcel_id=latest_kpi.parcel_id,
+                parcel_name=latest_kpi.parcel_name,
                 alert_type="stress_area",
                 severity="warning",
                 message=f"{latest_kpi.stress_area_pct:.1f}% del área con estrés.",
                 detected_at=latest_kpi.created_at
             ))
     
-    return alerts
+    body = _ALERTS_ADAPTER.dump_json(alerts)
+    await set_cached_response(cache_key, body, DASHBOARD_CACHE_TTL_SECONDS)
+    return json_response_with_etag(request, body)
 
 
 # ============================================================================
@@ -861,17 +990,19 @@ async def get_alerts(
 @router.get("/recommendations", response_model=RecommendationsResponse)
 async def get_recommendations(
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Devuelve las recomendaciones del último informe (baseline o biweekly).
     Estos datos vienen de Report.recommendations_json (guardado por n8n vía job-completed).
     """
-    latest_report = db.query(Report).filter(
-        Report.client_id == current_client.id,
-        Report.report_type.in_(["baseline", "biweekly"]),
-        Report.recommendations_json.isnot(None)
-    ).order_by(desc(Report.generated_at)).first()
+    latest_report = (await db.execute(
+        select(Report).where(
+            Report.client_id == current_client.id,
+            Report.report_type.in_(["baseline", "biweekly"]),
+            Report.recommendations_json.isnot(None)
+        ).order_by(desc(Report.generated_at)).limit(1)
+    )).scalars().first()
 
     if not latest_report or not latest_report.recommendations_json:
         return RecommendationsResponse(
@@ -909,18 +1040,20 @@ async def get_recommendations(
 @router.get("/weather-forecast")
 async def get_weather_forecast(
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Proxy a Open-Meteo: previsión 7 días usando el centroide de la primera parcela.
     Devuelve datos agregados + arrays diarios para mini-gráficas en dashboard.
     """
     # Obtener primera parcela activa con centroide
-    parcel = db.query(Parcel).filter(
-        Parcel.client_id == current_client.id,
-        Parcel.is_active == True,
-        Parcel.centroid_lat.isnot(None)
-    ).first()
+    parcel = (await db.execute(
+        select(Parcel).where(
+            Parcel.client_id == current_client.id,
+            Parcel.is_active == True,
+            Parcel.centroid_lat.isnot(None)
+        ).limit(1)
+    )).scalars().first()
 
     if not parcel or not parcel.centroid_lat or not parcel.centroid_lon:
         return {
@@ -940,12 +1073,11 @@ async def get_weather_forecast(
     )
 
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            resp = await client.get(url)
-            resp.raise_for_status()
-            data = resp.json()
+        resp = await get_http_client().get(url, timeout=10.0)
+        resp.raise_for_status()
+        data = resp.json()
     except Exception as e:
-        print(f"⚠️ Open-Meteo error: {e}")
+        logger.warning("⚠️ Open-Meteo error: %s", e)
         return {"available": False, "error": str(e)}
 
     daily = data.get("daily", {})
@@ -1032,32 +1164,28 @@ async def get_weather_forecast(
 async def get_climate_summary(
     days: int = Query(14, ge=7, le=90),
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Resumen climático de los últimos N días extraído de los KPIs almacenados.
     Usa tmax_mean, precip_mm, lst_mean de la tabla kpis.
     """
-    parcel_ids = db.query(Parcel.id).filter(
+    # Subquery (semi-join en Postgres): los ids no pasan por Python
+    parcel_ids = select(Parcel.id).where(
         Parcel.client_id == current_client.id,
         Parcel.is_active == True
-    ).all()
-    parcel_ids = [p[0] for p in parcel_ids]
-
-    if not parcel_ids:
-        return {
-            "period_days": days,
-            "observations_count": 0,
-            "tmax_mean": None,
-            "precip_total_mm": None,
-            "lst_mean": None,
-        }
+    )
 
     since = date.today() - timedelta(days=days)
-    kpis = db.query(Kpi).filter(
-        Kpi.parcel_id.in_(parcel_ids),
-        Kpi.observation_date >= since
-    ).order_by(Kpi.observation_date).all()
+    kpis = (await db.execute(
+        select(
+            Kpi.observation_date,
+            *_as_float_columns((Kpi.tmax_mean, Kpi.precip_mm, Kpi.lst_mean)),
+        ).where(
+            Kpi.parcel_id.in_(parcel_ids),
+            Kpi.observation_date >= since
+        ).order_by(Kpi.observation_date)
+    )).all()
 
     if not kpis:
         return {
@@ -1069,9 +1197,9 @@ async def get_climate_summary(
         }
 
     # Agregar datos climáticos (solo los que tienen valores)
-    tmax_vals = [float(k.tmax_mean) for k in kpis if k.tmax_mean is not None]
-    precip_vals = [float(k.precip_mm) for k in kpis if k.precip_mm is not None]
-    lst_vals = [float(k.lst_mean) for k in kpis if k.lst_mean is not None]
+    tmax_vals = [k.tmax_mean for k in kpis if k.tmax_mean is not None]
+    precip_vals = [k.precip_mm for k in kpis if k.precip_mm is not None]
+    lst_vals = [k.lst_mean for k in kpis if k.lst_mean is not None]
 
     return {
         "period_days": days,
@@ -1083,9 +1211,9 @@ async def get_climate_summary(
         "daily": [
             {
                 "date": k.observation_date.isoformat(),
-                "tmax": float(k.tmax_mean) if k.tmax_mean else None,
-                "precip": float(k.precip_mm) if k.precip_mm else None,
-                "lst": float(k.lst_mean) if k.lst_mean else None,
+                "tmax": k.tmax_mean or None,
+                "precip": k.precip_mm or None,
+                "lst": k.lst_mean or None,
             }
             for k in kpis
         ],
@@ -1093,97 +1221,151 @@ async def get_climate_summary(
 
 
 # ============================================================================
-# MAP DATA - Datos para capas satelitales  (sin cambios)
+# MAP DATA - Datos para capas satelitales
 # ============================================================================
 
+# Postgres arma el JSON completo en una sola query (parcela, último KPI,
+# último job completado e imágenes): sin merge de filas en Python.
+#
+# El último job completado y sus imágenes son del cliente, no de la parcela:
+# se resuelven una vez (CTE) y se unen a cada fila, así una variante con
+# varias parcelas no repite la búsqueda de gee_images por parcela.
+_MAP_DATA_SELECT = """
+    WITH last_job AS (
+        SELECT job_id
+        FROM jobs
+        WHERE jobs.client_id = :client_id AND jobs.status = 'completed'
+        ORDER BY completed_at DESC NULLS LAST
+        LIMIT 1
+    ),
+    job_images AS (
+        SELECT json_object_agg(index_type, '/api/images/' || job_id || '/' || filename ORDER BY id) AS images
+        FROM gee_images
+        WHERE gee_images.job_id = (SELECT job_id FROM last_job)
+          AND gee_images.png_base64 IS NOT NULL
+    )
+    SELECT json_build_object(
+        'parcel_id', p.id,
+        'parcel_name', p.parcel_name,
+        'job_id', j.job_id,
+        'farm', CASE WHEN r.geometry IS NOT NULL THEN json_build_object(
+            'type', 'Feature',
+            'geometry', r.geometry,
+            'properties', json_build_object(
+                'name', p.parcel_name,
+                'hectareas', p.hectares,
+                'tipo_cultivo', p.crop_type,
+                'ubicacion', COALESCE(p.location_name, p.municipality)
+            )
+        ) END,
+        'bounds', b.bounds,
+        'kpis', CASE WHEN k.observation_date IS NOT NULL OR b.bounds IS NOT NULL THEN json_build_object(
+            'ndvi_mean', k.ndvi_mean,
+            'ndvi_p10', k.ndvi_p10,
+            'ndvi_p90', k.ndvi_p90,
+            'ndwi_mean', k.ndwi_mean,
+            'stress_area_pct', k.stress_area_pct,
+            'observation_date', k.observation_date,
+            'bounds_south', p.bounds_south,
+            'bounds_west', p.bounds_west,
+            'bounds_north', p.bounds_north,
+            'bounds_east', p.bounds_east
+        ) END,
+        'images', i.images,
+        'has_satellite_layers', i.images IS NOT NULL
+    )::text AS body
+    FROM parcels p
+    CROSS JOIN LATERAL (
+        SELECT CASE g->>'type'
+                   WHEN 'Feature' THEN g->'geometry'
+                   WHEN 'FeatureCollection' THEN g->'features'->0->'geometry'
+                   WHEN 'Polygon' THEN g
+                   WHEN 'MultiPolygon' THEN g
+               END AS geometry
+        FROM (SELECT CASE WHEN jsonb_typeof(p.roi_geojson) = 'string'
+                          THEN (p.roi_geojson #>> '{}')::jsonb
+                          ELSE p.roi_geojson END AS g) roi
+    ) r
+    CROSS JOIN LATERAL (
+        SELECT CASE WHEN p.bounds_north IS NOT NULL THEN json_build_object(
+            'south', p.bounds_south, 'west', p.bounds_west,
+            'north', p.bounds_north, 'east', p.bounds_east
+        ) END AS bounds
+    ) b
+    LEFT JOIN kpis k ON k.id = p.latest_kpi_id
+    LEFT JOIN last_job j ON true
+    CROSS JOIN job_images i
+"""
+
+_PARCEL_MAP_DATA_SQL = text(_MAP_DATA_SELECT + """
+    WHERE p.id = :parcel_id AND p.client_id = :client_id
+""")
+
+# La primera parcela activa se resuelve en la misma query
+_CLIENT_MAP_DATA_SQL = text(_MAP_DATA_SELECT + """
+    WHERE p.client_id = :client_id AND p.is_active = true
+    LIMIT 1
+""")
+
+
+async def _build_map_data(
+    request: Request,
+    db: AsyncSession,
+    cache_key: str,
+    statement,
+    params: dict,
+) -> Optional[Response]:
+    """
+    Ejecuta una query de map-data y devuelve el JSON de Postgres (None si no
+    hay parcela). Cacheado por cliente como /summary.
+    """
+    body = await get_cached_response(cache_key)
+    if body is None:
+        result = (await db.execute(statement, params)).scalar()
+        if result is None:
+            return None
+        body = result.encode()
+        await set_cached_response(cache_key, body, DASHBOARD_CACHE_TTL_SECONDS)
+    return json_response_with_etag(request, body)
+
+
 @router.get("/parcels/{parcel_id}/map-data")
 async def get_parcel_map_data(
     parcel_id: str,
+    request: Request,
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Obtiene datos completos para renderizar el mapa con capas satelitales.
+    El JSON sale tal cual de Postgres (ver _MAP_DATA_SELECT).
     """
-    parcel = db.query(Parcel).filter(
-        Parcel.id == parcel_id,
-        Parcel.client_id == current_client.id
-    ).first()
+    response = await _build_map_data(
+        request, db,
+        await dashboard_cache_key(current_client.id, f"map-data:{parcel_id}"),
+        _PARCEL_MAP_DATA_SQL, {"parcel_id": parcel_id, "client_id": current_client.id}
+    )
     
-    if not parcel:
+    if response is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Parcela no encontrada")
     
-    last_job = db.query(Job).filter(
-        Job.client_id == current_client.id,
-        Job.status == "completed"
-    ).order_by(desc(Job.completed_at)).first()
-    
-    parsed_roi = parse_geojson(parcel.roi_geojson)
-    geometry = extract_geometry(parsed_roi)
-    bounds = calculate_bounds(geometry)
-    
-    latest_kpi = db.query(Kpi).filter(
-        Kpi.parcel_id == parcel.id
-    ).order_by(desc(Kpi.observation_date)).first()
-    
-    images = {}
-    job_id = None
-    if last_job:
-        job_id = last_job.job_id
-        try:
-            gee_images = db.query(GEEImage).filter(
-                GEEImage.job_id == job_id,
-                GEEImage.png_base64.isnot(None)
-            ).all()
-            for img in gee_images:
-                images[img.index_type] = f"/api/images/{job_id}/{img.filename}"
-        except Exception as e:
-            print(f"Warning: Could not fetch GEE images: {e}")
-    
-    return {
-        "parcel_id": parcel_id,
-        "parcel_name": parcel.parcel_name,
-        "job_id": job_id,
-        "farm": {
-            "type": "Feature",
-            "geometry": geometry,
-            "properties": {
-                "name": parcel.parcel_name,
-                "hectareas": float(parcel.hectares) if parcel.hectares else None,
-                "tipo_cultivo": parcel.crop_type,
-                "ubicacion": parcel.location_name or parcel.municipality
-            }
-        } if geometry else None,
-        "bounds": bounds,
-        "kpis": {
-            "ndvi_mean": float(latest_kpi.ndvi_mean) if latest_kpi and latest_kpi.ndvi_mean else None,
-            "ndvi_p10": float(latest_kpi.ndvi_p10) if latest_kpi and latest_kpi.ndvi_p10 else None,
-            "ndvi_p90": float(latest_kpi.ndvi_p90) if latest_kpi and latest_kpi.ndvi_p90 else None,
-            "ndwi_mean": float(latest_kpi.ndwi_mean) if latest_kpi and latest_kpi.ndwi_mean else None,
-            "stress_area_pct": float(latest_kpi.stress_area_pct) if latest_kpi and latest_kpi.stress_area_pct else None,
-            "observation_date": latest_kpi.observation_date.isoformat() if latest_kpi and latest_kpi.observation_date else None,
-            "bounds_south": bounds["south"] if bounds else None,
-            "bounds_west": bounds["west"] if bounds else None,
-            "bounds_north": bounds["north"] if bounds else None,
-            "bounds_east": bounds["east"] if bounds else None,
-        } if latest_kpi or bounds else None,
-        "images": images if images else None,
-        "has_satellite_layers": len(images) > 0
-    }
+    return response
 
 
 @router.get("/map-data")
 async def get_client_map_data(
+    request: Request,
     current_client: Client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtiene datos del mapa para la primera parcela activa del cliente."""
-    parcel = db.query(Parcel).filter(
-        Parcel.client_id == current_client.id,
-        Parcel.is_active == True
-    ).first()
+    response = await _build_map_data(
+        request, db,
+        await dashboard_cache_key(current_client.id, "map-data"),
+        _CLIENT_MAP_DATA_SQL, {"client_id": current_client.id}
+    )
     
-    if not parcel:
+    if response is None:
         return {
             "error": "No hay parcelas activas",
             "bounds": None,
@@ -1191,11 +1373,7 @@ async def get_client_map_data(
             "has_satellite_layers": False
         }
     
-    return await get_parcel_map_data(
-        parcel_id=str(parcel.id),
-        current_client=current_client,
-        db=db
-    )
+    return response
 
 
 # ============================================================================
@@ -1217,17 +1395,19 @@ class PacSignatureRequest(BaseModel):
 async def generate_pac_report_endpoint(
     req: PacReportRequest,
     current_client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Genera un informe PAC on-demand para la parcela indicada."""
     import base64 as _b64
     from app.services.generate_pac_report import generate_pac_report
 
-    parcel = db.query(Parcel).filter(
-        Parcel.id == req.parcel_id,
-        Parcel.client_id == current_client.id,
-        Parcel.is_active == True
-    ).first()
+    parcel = (await db.execute(
+        select(Parcel).where(
+            Parcel.id == req.parcel_id,
+            Parcel.client_id == current_client.id,
+            Parcel.is_active == True
+        ).limit(1)
+    )).scalars().first()
 
     if not parcel:
         raise HTTPException(status_code=404, detail="Parcela no encontrada")
@@ -1240,24 +1420,27 @@ async def generate_pac_report_endpoint(
         period_end = datetime.now().date()
         period_start = date(period_end.year - 1, period_end.month, period_end.day)
 
-    kpi_records_raw = (
-        db.query(Kpi)
-        .filter(
+    kpi_records_raw = (await db.execute(
+        select(
+            Kpi.observation_date,
+            *_as_float_columns((Kpi.ndvi_mean, Kpi.ndwi_mean, Kpi.stress_area_pct)),
+            Kpi.satellite_source,
+        )
+        .where(
             Kpi.parcel_id == req.parcel_id,
             Kpi.observation_date >= period_start,
             Kpi.observation_date <= period_end,
             Kpi.ndvi_mean.isnot(None)
         )
         .order_by(Kpi.observation_date)
-        .all()
-    )
+    )).all()
 
     kpi_records = [
         {
             'observation_date': str(k.observation_date),
-            'ndvi_mean': float(k.ndvi_mean) if k.ndvi_mean else None,
-            'ndwi_mean': float(k.ndwi_mean) if k.ndwi_mean else None,
-            'stress_area_pct': float(k.stress_area_pct) if k.stress_area_pct else None,
+            'ndvi_mean': k.ndvi_mean or None,
+            'ndwi_mean': k.ndwi_mean or None,
+            'stress_area_pct': k.stress_area_pct or None,
             'satellite_source': k.satellite_source or 'Sentinel-2',
         }
         for k in kpi_records_raw
@@ -1283,7 +1466,7 @@ async def generate_pac_report_endpoint(
         'kpi_records': kpi_records,
     }
 
-    result = generate_pac_report(pdf_data)
+    result = await run_in_threadpool(generate_pac_report, pdf_data)
 
     if not result['success']:
         raise HTTPException(
@@ -1291,12 +1474,12 @@ async def generate_pac_report_endpoint(
             detail=f"Error generando informe PAC: {result.get('error', 'Unknown')}"
         )
 
-    last_job = (
-        db.query(Job)
-        .filter(Job.parcel_id == req.parcel_id)
+    last_job = (await db.execute(
+        select(Job)
+        .where(Job.parcel_id == req.parcel_id)
         .order_by(desc(Job.created_at))
-        .first()
-    )
+        .limit(1)
+    )).scalars().first()
 
     new_report = Report(
         job_id=last_job.id if last_job else None,
@@ -1317,30 +1500,29 @@ async def generate_pac_report_endpoint(
     )
 
     db.add(new_report)
-    db.commit()
-    db.refresh(new_report)
+    await db.commit()
+    await invalidate_client_dashboard(current_client.id)
 
     # ── Notificar solicitud de firma PAC vía n8n ──
     if req.request_signature:
-        print(f"📝 PAC firma solicitada: report_id={new_report.id} | cliente={current_client.email} | ref={ref}")
+        logger.info("📝 PAC firma solicitada: report_id=%s | cliente=%s | ref=%s", new_report.id, current_client.email, ref)
         try:
-            import httpx
-            async with httpx.AsyncClient(timeout=10) as http:
-                await http.post(
-                    "https://primary-production-c678.up.railway.app/webhook/pac-signature-request",
-                    json={
-                        "client_name": current_client.client_name,
-                        "client_email": current_client.email,
-                        "parcel_name": parcel.parcel_name,
-                        "report_ref": ref,
-                        "report_id": str(new_report.id),
-                        "pac_status": result['pac_status'],
-                        "report_type": req.report_type,
-                        "requested_at": datetime.now().isoformat(),
-                    }
-                )
+            await get_http_client().post(
+                "https://primary-production-c678.up.railway.app/webhook/pac-signature-request",
+                json={
+                    "client_name": current_client.client_name,
+                    "client_email": current_client.email,
+                    "parcel_name": parcel.parcel_name,
+                    "report_ref": ref,
+                    "report_id": str(new_report.id),
+                    "pac_status": result['pac_status'],
+                    "report_type": req.report_type,
+                    "requested_at": datetime.now().isoformat(),
+                },
+                timeout=10,
+            )
         except Exception as e:
-            print(f"⚠️ No se pudo notificar firma PAC: {e}")
+            logger.warning("⚠️ No se pudo notificar firma PAC: %s", e)
 
     return {
         'success': True,
@@ -1361,7 +1543,7 @@ async def generate_pac_report_endpoint(
 async def get_pac_report_status(
     report_id: str,
     current_client = Depends(get_current_active_client),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Devuelve el estado de un informe PAC."""
     try:
@@ -1369,10 +1551,9 @@ async def get_pac_report_status(
     except ValueError:
         raise HTTPException(status_code=400, detail="ID inválido")
 
-    report = db.query(Report).filter(
-        Report.id == rid,
-        Report.client_id == current_client.id
-    ).first()
+    report = (await db.execute(
+        _OWNED_REPORT_STMT, {"report_id": rid, "client_id": current_client.id}
+    )).scalars().first()
 
     if not report:
         raise HTTPException(status_code=404, detail="Informe no encontrado")
@@ -1396,7 +1577,7 @@ async def update_pac_signature(
     agronomist_name: str,
     agronomist_college: str = '',
     x_internal_key: str = '',
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Marca un informe PAC como firmado (uso interno Mu.Orbita)."""
     import os
@@ -1409,7 +1590,9 @@ async def update_pac_signature(
     except ValueError:
         raise HTTPException(status_code=400, detail="ID inválido")
 
-    report = db.query(Report).filter(Report.id == rid).first()
+    report = (await db.execute(
+        select(Report).where(Report.id == rid).limit(1)
+    )).scalars().first()
     if not report:
         raise HTTPException(status_code=404, detail="Informe no encontrado")
 
@@ -1420,5 +1603,5 @@ async def update_pac_signature(
     meta['signature_date'] = datetime.now().isoformat()
     report.report_metadata = meta
 
-    db.commit()
+    await db.commit()
     return {'success': True, 'report_id': str(report.id), 'agronomist_name': agronomist_name}
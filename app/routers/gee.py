@@ -12,13 +12,16 @@ V5.1: Mantiene images_base64 en respuesta para que n8n use en PDF.
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import Optional
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 import json
 import traceback
 from types import SimpleNamespace
 
 from app.database import get_db
-from app.models.gee_image import GEEImage
+from app.models.job import Job
+from app.services.image_provider import upsert_gee_images
+from app.services.response_cache import invalidate_client_dashboard
 
 router = APIRouter(prefix="/gee", tags=["GEE"])
 
@@ -52,38 +55,11 @@ def normalize_crop_type(crop_type: str) -> str:
 
 
 def save_images_to_db(db: Session, job_id: str, images_base64: dict, bounds: dict = None):
-    saved = []
-    for index_type, b64_data in images_base64.items():
-        if not b64_data:
-            continue
-        filename = f"PNG_{index_type}.png"
-        existing = db.query(GEEImage).filter(
-            GEEImage.job_id == job_id,
-            GEEImage.index_type == index_type
-        ).first()
-        if existing:
-            existing.png_base64 = b64_data
-            if bounds:
-                existing.bounds_north = bounds.get('north')
-                existing.bounds_south = bounds.get('south')
-                existing.bounds_east = bounds.get('east')
-                existing.bounds_west = bounds.get('west')
-            saved.append({"index_type": index_type, "action": "updated"})
-        else:
-            new_image = GEEImage(
-                job_id=job_id,
-                index_type=index_type,
-                filename=filename,
-                png_base64=b64_data,
-                bounds_north=bounds.get('north') if bounds else None,
-                bounds_south=bounds.get('south') if bounds else None,
-                bounds_east=bounds.get('east') if bounds else None,
-                bounds_west=bounds.get('west') if bounds else None,
-            )
-            db.add(new_image)
-            saved.append({"index_type": index_type, "action": "created"})
+    images = {index_type: b64_data for index_type, b64_data in images_base64.items() if b64_data}
+    actions = upsert_gee_images(db, job_id, images, bounds)
+    client_id = db.execute(select(Job.client_id).where(Job.job_id == job_id).limit(1)).scalar()
     db.commit()
-    return saved
+    return client_id, [{"index_type": index_type, "action": action} for index_type, action in actions.items()]
 
 
 @router.post("/execute")
@@ -143,7 +119,8 @@ async def execute_gee(request: GEERequest, db: Session = Depends(get_db)):
             
             if images_base64:
                 try:
-                    saved_images = save_images_to_db(db, request.job_id, images_base64, bounds)
+                    client_id, saved_images = save_images_to_db(db, request.job_id, images_base64, bounds)
+                    await invalidate_client_dashboard(client_id)
                     result['images_saved'] = saved_images
                     result['images_saved_count'] = len(saved_images)
                 except Exception as e:
@@ -11,19 +11,49 @@ CAMBIOS V5.0:
 ✅ Dashboard sigue llamando: /api/images/{job_id}/PNG_NDVI.png → funciona igual
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Request
-from fastapi.responses import Response, JSONResponse
-from sqlalchemy.orm import Session
-from typing import Optional, List
+from fastapi import APIRouter, HTTPException, Depends, Path, Request
+from fastapi.responses import Response, ORJSONResponse, RedirectResponse
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Literal, Optional, List
 from pydantic import BaseModel
-import re
+from cachetools import TTLCache
 import base64
+import threading
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models.gee_image import GEEImage
+from app.models.job import Job
+from app.services.image_provider import upsert_gee_images_async
+from app.services.response_cache import invalidate_client_dashboard, json_response_with_etag
 
 router = APIRouter(prefix="/api/images", tags=["Satellite Images"])
 
+# Validación en el routing (pydantic-core): 422 antes de entrar al handler
+JobIdPath = Path(..., pattern=r'^[A-Za-z0-9_]+$')
+
+ImageFilename = Literal[
+    'PNG_NDVI.png', 'PNG_NDWI.png', 'PNG_EVI.png',
+    'PNG_NDCI.png', 'PNG_SAVI.png', 'PNG_VRA.png', 'PNG_LST.png',
+    # Versiones _WEB (overlay limpio para Leaflet):
+    'PNG_NDVI_WEB.png', 'PNG_NDWI_WEB.png', 'PNG_EVI_WEB.png',
+    'PNG_NDCI_WEB.png', 'PNG_SAVI_WEB.png', 'PNG_VRA_WEB.png', 'PNG_LST_WEB.png',
+]
+
+# Imágenes legacy en Drive: (job_id, index_type) → gdrive_file_id.
+# Los ids no cambian; un hit redirige sin tocar la BD.
+DRIVE_REDIRECT_TTL_SECONDS = 3600
+_drive_ids: TTLCache = TTLCache(maxsize=10_000, ttl=DRIVE_REDIRECT_TTL_SECONDS)
+_drive_ids_lock = threading.Lock()
+
+
+def _drive_redirect(gdrive_file_id: str) -> RedirectResponse:
+    return RedirectResponse(
+        url=f"https://drive.google.com/uc?export=view&id={gdrive_file_id}",
+        status_code=307,
+        headers={"Cache-Control": f"public, max-age={DRIVE_REDIRECT_TTL_SECONDS}"},
+    )
+
 
 # =====================================================
 # SERVIR PNGs DESDE BD — endpoint principal del dashboard
@@ -31,9 +61,9 @@ router = APIRouter(prefix="/api/images", tags=["Satellite Images"])
 
 @router.get("/{job_id}/{filename}")
 async def get_satellite_image(
-    job_id: str,
-    filename: str,
-    db: Session = Depends(get_db)
+    filename: ImageFilename,
+    job_id: str = JobIdPath,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     El dashboard llama: /api/images/MUORBITA_xxx/PNG_NDVI.png
@@ -43,29 +73,21 @@ async def get_satellite_image(
     
     Mucho más rápido y sin dependencia externa.
     """
-    # Validar job_id
-    if not re.match(r'^[A-Za-z0-9_]+$', job_id):
-        raise HTTPException(status_code=400, detail="Invalid job_id format")
-
-    # Validar filename
-    valid_files = [
-        'PNG_NDVI.png', 'PNG_NDWI.png', 'PNG_EVI.png',
-        'PNG_NDCI.png', 'PNG_SAVI.png', 'PNG_VRA.png', 'PNG_LST.png',
-        # Versiones _WEB (overlay limpio para Leaflet):
-        'PNG_NDVI_WEB.png', 'PNG_NDWI_WEB.png', 'PNG_EVI_WEB.png',
-        'PNG_NDCI_WEB.png', 'PNG_SAVI_WEB.png', 'PNG_VRA_WEB.png', 'PNG_LST_WEB.png',
-    ]
-    if filename not in valid_files:
-        raise HTTPException(status_code=400, detail=f"Invalid filename: {filename}")
-
     # Extraer index_type del filename: "PNG_NDVI.png" → "NDVI"
     index_type = filename.replace('PNG_', '').replace('.png', '')
 
-    # Buscar en BD
-    image_record = db.query(GEEImage).filter(
-        GEEImage.job_id == job_id,
-        GEEImage.index_type == index_type
-    ).first()
+    with _drive_ids_lock:
+        gdrive_file_id = _drive_ids.get((job_id, index_type))
+    if gdrive_file_id:
+        return _drive_redirect(gdrive_file_id)
+
+    # Buscar en BD: solo las dos columnas que se usan, sin hidratar el ORM
+    image_record = (await db.execute(
+        select(GEEImage.png_base64, GEEImage.gdrive_file_id).where(
+            GEEImage.job_id == job_id,
+            GEEImage.index_type == index_type
+        )
+    )).first()
 
     if not image_record:
         raise HTTPException(status_code=404, detail=f"Image not found: {job_id}/{filename}")
@@ -91,10 +113,10 @@ async def get_satellite_image(
             )
     
     # Fallback v4: si aún tiene gdrive_file_id (datos legacy)
-    if hasattr(image_record, 'gdrive_file_id') and image_record.gdrive_file_id:
-        from fastapi.responses import RedirectResponse
-        gdrive_url = f"https://drive.google.com/uc?export=view&id={image_record.gdrive_file_id}"
-        return RedirectResponse(url=gdrive_url)
+    if image_record.gdrive_file_id:
+        with _drive_ids_lock:
+            _drive_ids[(job_id, index_type)] = image_record.gdrive_file_id
+        return _drive_redirect(image_record.gdrive_file_id)
 
     raise HTTPException(status_code=404, detail=f"No image data for: {job_id}/{filename}")
 
@@ -103,44 +125,57 @@ async def get_satellite_image(
 # LISTAR IMÁGENES DE UN JOB
 # =====================================================
 
+_LIST_JOB_IMAGES_SQL = text("""
+    SELECT
+        COUNT(*) AS image_count,
+        (SELECT status FROM jobs WHERE jobs.job_id = :job_id) AS job_status,
+        json_build_object(
+            'job_id', CAST(:job_id AS text),
+            'count', COUNT(*),
+            'bounds', (array_agg(
+                json_build_object(
+                    'north', bounds_north, 'south', bounds_south,
+                    'east', bounds_east, 'west', bounds_west
+                ) ORDER BY id
+            ) FILTER (WHERE bounds_north IS NOT NULL))[1],
+            'images', json_object_agg(
+                index_type,
+                json_build_object(
+                    'url', '/api/images/' || job_id || '/' || filename,
+                    'has_data', COALESCE(octet_length(png_base64) > 0, false),
+                    'source', CASE WHEN octet_length(png_base64) > 0
+                                   THEN 'database' ELSE 'legacy_drive' END
+                )
+                ORDER BY id
+            )
+        )::text AS body
+    FROM gee_images
+    WHERE job_id = :job_id
+""")
+
+
 @router.get("/{job_id}")
 async def list_job_images(
-    job_id: str,
-    db: Session = Depends(get_db)
+    request: Request,
+    job_id: str = JobIdPath,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Lista todas las imágenes disponibles para un job."""
-    if not re.match(r'^[A-Za-z0-9_]+$', job_id):
-        raise HTTPException(status_code=400, detail="Invalid job_id format")
-
-    images = db.query(GEEImage).filter(GEEImage.job_id == job_id).all()
+    """
+    Lista todas las imágenes disponibles para un job.
+    Con el job completado las imágenes ya no cambian: se envía ETag +
+    Cache-Control y se responde 304 si el cliente ya tiene esa versión.
+    """
+    # Postgres arma el JSON completo: no se leen los png_base64 ni se
+    # (de)serializa nada en Python, el texto va directo al body
+    row = (await db.execute(_LIST_JOB_IMAGES_SQL, {"job_id": job_id})).first()
 
-    if not images:
+    if not row or not row.image_count:
         raise HTTPException(status_code=404, detail=f"No images found for job: {job_id}")
 
-    result_images = {}
-    bounds = None
-    
-    for img in images:
-        result_images[img.index_type] = {
-            "url": f"/api/images/{job_id}/{img.filename}",
-            "has_data": bool(img.png_base64),
-            "source": "database" if img.png_base64 else "legacy_drive"
-        }
-        # Extraer bounds del primer registro que los tenga
-        if not bounds and img.bounds_north is not None:
-            bounds = {
-                "north": img.bounds_north,
-                "south": img.bounds_south,
-                "east": img.bounds_east,
-                "west": img.bounds_west
-            }
-
-    return {
-        "job_id": job_id,
-        "count": len(images),
-        "bounds": bounds,
-        "images": result_images
-    }
+    body = row.body.encode()
+    if row.job_status == "completed":
+        return json_response_with_etag(request, body, cache_control="public, max-age=300")
+    return Response(content=body, media_type="application/json", headers={"Cache-Control": "no-cache"})
 
 
 # =====================================================
@@ -156,7 +191,7 @@ class StoreImageRequest(BaseModel):
 @router.post("/store")
 async def store_images(
     request: StoreImageRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Guarda PNGs (base64) en la BD.
@@ -175,8 +210,8 @@ async def store_images(
         "bounds": {"north": 37.5, "south": 37.4, "east": -4.0, "west": -4.1}
     }
     """
-    saved = []
-    
+    valid = {}
+    sizes_kb = {}
     for index_type, b64_data in request.images.items():
         if not b64_data or not isinstance(b64_data, str):
             continue
@@ -189,36 +224,28 @@ async def store_images(
         except Exception:
             continue
         
-        filename = f"PNG_{index_type}.png"
-        
-        existing = db.query(GEEImage).filter(
-            GEEImage.job_id == request.job_id,
-            GEEImage.index_type == index_type
-        ).first()
-        
-        if existing:
-            existing.png_base64 = b64_data
-            if request.bounds:
-                existing.bounds_north = request.bounds.get('north')
-                existing.bounds_south = request.bounds.get('south')
-                existing.bounds_east = request.bounds.get('east')
-                existing.bounds_west = request.bounds.get('west')
-            saved.append({"index_type": index_type, "action": "updated", "size_kb": round(len(b64_data) / 1024)})
-        else:
-            new_image = GEEImage(
-                job_id=request.job_id,
-                index_type=index_type,
-                filename=filename,
-                png_base64=b64_data,
-                bounds_north=request.bounds.get('north') if request.bounds else None,
-                bounds_south=request.bounds.get('south') if request.bounds else None,
-                bounds_east=request.bounds.get('east') if request.bounds else None,
-                bounds_west=request.bounds.get('west') if request.bounds else None,
-            )
-            db.add(new_image)
-            saved.append({"index_type": index_type, "action": "created", "size_kb": round(len(b64_data) / 1024)})
+        valid[index_type] = b64_data
+        sizes_kb[index_type] = round(len(b64_data) / 1024)
+    
+    # Un único INSERT ... ON CONFLICT DO UPDATE para todas las imágenes
+    actions = await upsert_gee_images_async(db, request.job_id, valid, request.bounds)
+    client_id = (await db.execute(
+        select(Job.client_id).where(Job.job_id == request.job_id).limit(1)
+    )).scalar()
+    await db.commit()
+
+    # /map-data del cliente lleva las imágenes y has_satellite_layers
+    await invalidate_client_dashboard(client_id)
+
+    # Ya tienen PNG en BD: dejar de redirigir a Drive
+    with _drive_ids_lock:
+        for index_type in actions:
+            _drive_ids.pop((request.job_id, index_type), None)
     
-    db.commit()
+    saved = [
+        {"index_type": index_type, "action": action, "size_kb": sizes_kb[index_type]}
+        for index_type, action in actions.items()
+    ]
     
     return {
         "success": True,
@@ -234,17 +261,25 @@ async def store_images(
 
 @router.get("/{job_id}/map-data")
 async def get_map_data(
-    job_id: str,
-    db: Session = Depends(get_db)
+    job_id: str = JobIdPath,
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Devuelve bounds y URLs de imágenes para el dashboard map.
     El dashboard usa esto para cargar las capas satelitales en Leaflet.
     """
-    if not re.match(r'^[A-Za-z0-9_]+$', job_id):
-        raise HTTPException(status_code=400, detail="Invalid job_id format")
-
-    images = db.query(GEEImage).filter(GEEImage.job_id == job_id).all()
+    # Sin png_base64 (MBs por fila): basta saber si tiene datos
+    images = (await db.execute(
+        select(
+            GEEImage.index_type,
+            GEEImage.filename,
+            func.coalesce(func.octet_length(GEEImage.png_base64) > 0, False).label("has_data"),
+            GEEImage.bounds_north,
+            GEEImage.bounds_south,
+            GEEImage.bounds_east,
+            GEEImage.bounds_west,
+        ).where(GEEImage.job_id == job_id)
+    )).all()
     
     if not images:
         return {"job_id": job_id, "bounds": None, "images": {}}
@@ -253,7 +288,7 @@ async def get_map_data(
     image_urls = {}
     
     for img in images:
-        if img.png_base64:
+        if img.has_data:
             image_urls[img.index_type] = f"/api/images/{job_id}/{img.filename}"
         
         if not bounds and img.bounds_north is not None:
@@ -281,7 +316,7 @@ async def convert_tiff_from_drive_legacy(request: Request):
     LEGACY v4 — Ya no se usa en v5.0
     Las imágenes se generan como PNG directamente en GEE.
     """
-    return JSONResponse({
+    return ORJSONResponse({
         "success": False,
         "error": "v5.0: Este endpoint ya no se usa. Las imágenes PNG se generan directamente en GEE y se guardan en la BD. No hay GeoTIFFs ni Drive.",
         "migration": "Use POST /gee/execute que guarda imágenes automáticamente, o POST /api/images/store para guardar manualmente."
@@ -298,7 +333,7 @@ async def register_images_legacy(request: RegisterImageRequestLegacy):
     LEGACY v4 — Ya no se usa en v5.0
     Use POST /api/images/store con base64 en lugar de gdrive_file_id.
     """
-    return JSONResponse({
+    return ORJSONResponse({
         "success": False,
         "error": "v5.0: Use POST /api/images/store con formato {images: {NDVI: 'base64...'}}"
     }, status_code=410)
@@ -3,13 +3,32 @@ Mu.Orbita Reports Router v1.1
 - Añade images_base64 al modelo Pydantic (documentación)
 - El endpoint sigue usando request.json() para pasar TODOS los campos
 """
-from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import Response
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
+import logging
+import re
+
+from app.config import settings
+from app.services.pdf_cache import generated_pdf_path, get_cached_pdf, save_generated_pdf
+
+# Import una sola vez al arrancar (reportlab + matplotlib pesan), no por request
+try:
+    from app.services.generate_pdf_report import (
+        generate_muorbita_report, render_muorbita_pdf, report_filename,
+    )
+except ImportError as e:
+    generate_muorbita_report = render_muorbita_pdf = report_filename = None
+    _PDF_IMPORT_ERROR = str(e)
+
+logger = logging.getLogger("muorbita")
 
 router = APIRouter(prefix="/api/v1", tags=["Reports"])
 
+_PDF_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
 
 class PDFRequest(BaseModel):
     job_id: str
@@ -61,7 +80,10 @@ class PDFRequest(BaseModel):
 
 
 @router.post("/generate-pdf")
-async def generate_pdf(request: Request):
+async def generate_pdf(
+    request: Request,
+    encoding: str = Query("base64", pattern="^(base64|binary)$"),
+):
     """
     Genera un informe PDF profesional.
     
@@ -70,10 +92,20 @@ async def generate_pdf(request: Request):
     - images_base64: {NDVI: "base64...", NDWI: "base64..."}  (dict, direct from GEE)
     
     El generador v3.2 busca ambos y usa KEY_ALIASES para mapear claves.
+    
+    ?encoding=binary devuelve el PDF como application/pdf (sin base64 en JSON:
+    un 33% menos de payload y sin la copia codificada en memoria).
+
+    Con encoding=base64, si el PDF supera MAX_INLINE_PDF_BYTES (2 MiB por
+    defecto) la respuesta trae pdf_base64=null y pdf_url para descargarlo
+    con GET /api/v1/pdf/{pdf_id}.
     """
-    try:
-        from app.services.generate_pdf_report import generate_muorbita_report
+    if generate_muorbita_report is None:
+        logger.error("Generador PDF no disponible: %s", _PDF_IMPORT_ERROR)
+        raise HTTPException(status_code=500, detail="Generador PDF no disponible")
 
+    data = {}
+    try:
         # Obtener JSON del request (bypasses Pydantic to pass ALL fields)
         raw_data = await request.json()
 
@@ -83,25 +115,64 @@ async def generate_pdf(request: Request):
         else:
             data = raw_data
 
-        # Normalizar time_series/timeseries
-        if 'time_series' in data and 'timeseries' not in data:
-            data['timeseries'] = data['time_series']
+        # Normalizar timeseries -> time_series (la única clave que lee el
+        # generador). Se reutiliza el dict del body, sin copiarlo ni volcarlo.
+        if 'time_series' not in data and 'timeseries' in data:
+            data['time_series'] = data.pop('timeseries')
 
         # Log para debugging
-        png_count = len(data.get('png_images', []) or [])
-        b64_count = len(data.get('images_base64', {}) or {})
-        print(f"📄 generate-pdf: job={data.get('job_id','?')} | png_images={png_count} | images_base64={b64_count}")
+        logger.info(
+            "📄 generate-pdf: job=%s | png_images=%d | images_base64=%d",
+            data.get('job_id', '?'),
+            len(data.get('png_images', []) or []),
+            len(data.get('images_base64', {}) or {}),
+        )
 
-        result = generate_muorbita_report(data)
+        if encoding == "binary":
+            return Response(
+                content=await run_in_threadpool(render_muorbita_pdf, data),
+                media_type="application/pdf",
+                headers={"Content-Disposition": f'attachment; filename="{report_filename(data)}"'},
+            )
+
+        # reportlab/matplotlib son CPU puro: fuera del event loop para no
+        # bloquear el resto de requests mientras se genera el PDF
+        result = await run_in_threadpool(
+            generate_muorbita_report, data, settings.max_inline_pdf_bytes
+        )
+
+        if not result.get('success'):
+            # Mismo contrato (success=False) pero sin el mensaje interno:
+            # generate_muorbita_report ya dejó el traceback en el log
+            return {'success': False, 'error': "Error generando PDF", 'job_id': result.get('job_id')}
+
+        pdf_bytes = result.pop('pdf_bytes', None)
+        if pdf_bytes is not None:
+            pdf_id = await save_generated_pdf(pdf_bytes)
+            result['pdf_url'] = f"/api/v1/pdf/{pdf_id}"
 
         return result
 
-    except Exception as e:
-        import traceback
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error generando PDF: {str(e)}\n{traceback.format_exc()}"
-        )
+    except Exception:
+        # El traceback va al log, no a la respuesta
+        job_id = data.get('job_id', '?') if isinstance(data, dict) else '?'
+        logger.exception("Error generando PDF para job %s", job_id)
+        raise HTTPException(status_code=500, detail="Error generando PDF")
+
+
+@router.get("/pdf/{pdf_id}")
+async def download_generated_pdf(pdf_id: str):
+    """
+    Descarga un PDF de /generate-pdf que superó el límite para ir inline.
+    Vive GENERATED_PDF_TTL_HOURS en el disco de la instancia que lo generó.
+    """
+    if not _PDF_ID_RE.match(pdf_id):
+        raise HTTPException(status_code=400, detail="Invalid pdf_id")
+
+    path = await get_cached_pdf(generated_pdf_path(pdf_id))
+    if path is None:
+        raise HTTPException(status_code=404, detail="PDF no encontrado")
+    return FileResponse(path, media_type="application/pdf", filename=f"{pdf_id}.pdf")
 
 
 @router.get("/health")
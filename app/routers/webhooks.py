@@ -20,33 +20,41 @@ CAMBIOS v4.5 (mantenidos):
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status, Header
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, func, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from typing import Optional, Union, List
 from datetime import datetime, date as date_type
-from pydantic import BaseModel
-from passlib.context import CryptContext
-import json
-import traceback
-
-from app.database import get_db
+from pydantic import BaseModel, TypeAdapter
+import logging
+import orjson
+import time
+import uuid
+
+from app.database import get_async_db
+from app.dependencies import verify_webhook_secret
 from app.models import Client, Parcel, Job, Kpi, Report
 from app.schemas import (
-    WebhookJobCompleted, WebhookKpiBatch, KpiCreate,
+    WebhookJobCompleted, WebhookKpiBatch, KpiBatchItem,
     MessageResponse, JobCreate
 )
 from app.config import settings
+from app.services.auth_pool import hash_password
+from app.services.response_cache import invalidate_client_dashboard
+
+logger = logging.getLogger("muorbita")
 
 router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Serializador del batch de KPIs construido una vez: un dump_python por batch
+_KPI_BATCH_ADAPTER = TypeAdapter(List[KpiBatchItem])
 
 
 def verify_webhook(x_webhook_secret: Optional[str] = Header(None)):
     if not settings.n8n_webhook_secret:
         return True
-    if x_webhook_secret != settings.n8n_webhook_secret:
+    if not verify_webhook_secret(x_webhook_secret):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Webhook secret inválido"
@@ -61,23 +69,28 @@ def parse_roi_geojson(roi_data):
         return roi_data
     if isinstance(roi_data, str):
         try:
-            return json.loads(roi_data)
-        except:
+            return orjson.loads(roi_data)
+        except orjson.JSONDecodeError:
             return None
     return None
 
 
-def resolve_client_and_parcel(db: Session, email: str):
+async def _first(db: AsyncSession, stmt):
+    """Primera entidad del select o None (equivalente a query().first())"""
+    return (await db.execute(stmt.limit(1))).scalars().first()
+
+
+async def resolve_client_and_parcel(db: AsyncSession, email: str):
     if not email:
         return None, None
-    client = db.query(Client).filter(Client.email == email).first()
-    if not client:
+    client_id = await _first(db, select(Client.id).where(Client.email_matches(email)))
+    if not client_id:
         return None, None
-    parcel = db.query(Parcel).filter(
-        Parcel.client_id == client.id,
+    parcel_id = await _first(db, select(Parcel.id).where(
+        Parcel.client_id == client_id,
         Parcel.is_active == True
-    ).first()
-    return client.id, (parcel.id if parcel else None)
+    ))
+    return client_id, parcel_id
 
 
 # ============================================================
@@ -87,10 +100,10 @@ def resolve_client_and_parcel(db: Session, email: str):
 @router.post("/job-started", response_model=MessageResponse)
 async def webhook_job_started(
     payload: JobCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_webhook)
 ):
-    client = db.query(Client).filter(Client.email == payload.client_email).first()
+    client = await _first(db, select(Client).where(Client.email_matches(payload.client_email)))
     if not client:
         client = Client(
             email=payload.client_email,
@@ -99,12 +112,12 @@ async def webhook_job_started(
             source="n8n_webhook"
         )
         db.add(client)
-        db.commit()
-        db.refresh(client)
+        # flush (no commit) para tener client.id; un solo commit al final
+        await db.flush()
 
     parcel = None
     if payload.parcel_id:
-        parcel = db.query(Parcel).filter(Parcel.id == payload.parcel_id).first()
+        parcel = await _first(db, select(Parcel).where(Parcel.id == payload.parcel_id))
 
     roi_geojson = parse_roi_geojson(payload.roi_geojson)
 
@@ -117,11 +130,11 @@ async def webhook_job_started(
             roi_geojson=roi_geojson
         )
         db.add(parcel)
-        db.commit()
-        db.refresh(parcel)
+        await db.flush()
 
-    import time
-    job_id = f"JOB_{int(time.time() * 1000)}"
+    # Milisegundos (orden cronológico) + sufijo aleatorio: dos jobs en el
+    # mismo ms ya no chocan con el UNIQUE de jobs.job_id
+    job_id = f"JOB_{time.time_ns() // 1_000_000}_{uuid.uuid4().hex[:6]}"
 
     job = Job(
         job_id=job_id,
@@ -139,7 +152,7 @@ async def webhook_job_started(
         started_at=datetime.utcnow()
     )
     db.add(job)
-    db.commit()
+    await db.commit()
 
     return MessageResponse(message=f"Job {job_id} registrado")
 
@@ -204,14 +217,14 @@ class WebhookJobCompletedV2(BaseModel):
 @router.post("/job-completed", response_model=MessageResponse)
 async def webhook_job_completed(
     payload: WebhookJobCompletedV2,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_webhook)
 ):
-    job = db.query(Job).filter(Job.job_id == payload.job_id).first()
+    job = await _first(db, select(Job).where(Job.job_id == payload.job_id))
 
     # ── 0. Si no existe el job, crearlo ──
     if not job:
-        resolved_client_id, resolved_parcel_id = resolve_client_and_parcel(
+        resolved_client_id, resolved_parcel_id = await resolve_client_and_parcel(
             db, payload.client_email
         )
         # ══ v4.3: analysis_type del payload ══
@@ -226,26 +239,26 @@ async def webhook_job_completed(
             completed_at=datetime.utcnow() if payload.status == "completed" else None
         )
         db.add(job)
-        db.commit()
-        db.refresh(job)
+        await db.commit()
+        await db.refresh(job)
 
         if resolved_client_id:
-            print(f"✅ Job {payload.job_id} creado con client={resolved_client_id}, parcel={resolved_parcel_id}")
+            logger.info("✅ Job %s creado con client=%s, parcel=%s", payload.job_id, resolved_client_id, resolved_parcel_id)
         else:
-            print(f"⚠️ Job {payload.job_id} creado sin client_id (email: {payload.client_email})")
+            logger.warning("⚠️ Job %s creado sin client_id (email: %s)", payload.job_id, payload.client_email)
 
     # ── 0b. Resolver client_id si falta ──
     if not job.client_id and payload.client_email:
-        resolved_client_id, resolved_parcel_id = resolve_client_and_parcel(
+        resolved_client_id, resolved_parcel_id = await resolve_client_and_parcel(
             db, payload.client_email
         )
         if resolved_client_id:
             job.client_id = resolved_client_id
             if not job.parcel_id and resolved_parcel_id:
                 job.parcel_id = resolved_parcel_id
-            db.commit()
-            db.refresh(job)
-            print(f"🔗 Job {payload.job_id} vinculado a client={resolved_client_id}, parcel={resolved_parcel_id}")
+            await db.commit()
+            await db.refresh(job)
+            logger.info("🔗 Job %s vinculado a client=%s, parcel=%s", payload.job_id, resolved_client_id, resolved_parcel_id)
 
     # ── 1. Actualizar campos del Job ──
     job.status = payload.status
@@ -293,27 +306,27 @@ async def webhook_job_completed(
     if payload.ndvi_zscore_seasonal is not None:
         job.ndvi_zscore_seasonal = payload.ndvi_zscore_seasonal
 
-    db.commit()
-    db.refresh(job)
+    await db.commit()
+    await db.refresh(job)
 
     # ══ v4.5: Guardar sigpac_ref en parcela si viene y no lo tiene ══
     if payload.sigpac_ref and job.parcel_id:
         try:
-            parcel = db.query(Parcel).filter(Parcel.id == job.parcel_id).first()
+            parcel = await _first(db, select(Parcel).where(Parcel.id == job.parcel_id))
             if parcel and not parcel.parcel_code:
                 parcel.parcel_code = payload.sigpac_ref
-                db.commit()
-                print(f"📝 SIGPAC guardado en parcela: {payload.sigpac_ref}")
+                await db.commit()
+                logger.info("📝 SIGPAC guardado en parcela: %s", payload.sigpac_ref)
         except Exception as e:
-            print(f"⚠️ No se pudo guardar SIGPAC: {e}")
+            logger.warning("⚠️ No se pudo guardar SIGPAC: %s", e)
 
     # ── 2. Auto-crear Report ──
     report_created = False
     if payload.status == "completed" and job.client_id:
         try:
-            existing_report = db.query(Report).filter(
+            existing_report = await _first(db, select(Report).where(
                 Report.job_id == job.id
-            ).first()
+            ))
 
             if not existing_report:
                 new_report = Report(
@@ -339,10 +352,10 @@ async def webhook_job_completed(
                     },
                 )
                 db.add(new_report)
-                db.commit()
+                await db.commit()
                 report_created = True
                 recs_count = len(payload.recommendations_json) if payload.recommendations_json else 0
-                print(f"✅ Report auto-creado para job {payload.job_id} (type={job.analysis_type}, recs={recs_count})")
+                logger.info("✅ Report auto-creado para job %s (type=%s, recs=%d)", payload.job_id, job.analysis_type, recs_count)
             else:
                 if payload.pdf_url:
                     existing_report.pdf_url = payload.pdf_url
@@ -367,13 +380,14 @@ async def webhook_job_completed(
                 if payload.risk_heterogeneity_level:
                     meta['risk_heterogeneity_level'] = payload.risk_heterogeneity_level
                 existing_report.report_metadata = meta
-                db.commit()
-                print(f"📝 Report existente actualizado para job {payload.job_id}")
+                await db.commit()
+                logger.info("📝 Report existente actualizado para job %s", payload.job_id)
 
-        except Exception as e:
-            print(f"⚠️ Error creando Report para job {payload.job_id}: {e}")
-            print(traceback.format_exc())
-            db.rollback()
+        except Exception:
+            logger.exception("⚠️ Error creando Report para job %s", payload.job_id)
+            await db.rollback()
+            # El rollback expira el job: recargarlo aquí, en async no hay lazy load
+            await db.refresh(job)
 
     # ── 3. Auto-crear/actualizar Kpi ──
     kpi_created = False
@@ -381,10 +395,10 @@ async def webhook_job_completed(
         try:
             obs_date = getattr(job, 'end_date', None) or date_type.today()
 
-            existing_kpi = db.query(Kpi).filter(
+            existing_kpi = await _first(db, select(Kpi).where(
                 Kpi.parcel_id == job.parcel_id,
                 Kpi.observation_date == obs_date
-            ).first()
+            ))
 
             if existing_kpi:
                 if payload.ndvi_mean is not None:
@@ -401,8 +415,8 @@ async def webhook_job_completed(
                     existing_kpi.stress_area_ha = payload.stress_area_ha
                 if payload.stress_area_pct is not None:
                     existing_kpi.stress_area_pct = payload.stress_area_pct
-                db.commit()
-                print(f"📝 KPI actualizado para parcela {job.parcel_id} fecha {obs_date}")
+                await db.commit()
+                logger.info("📝 KPI actualizado para parcela %s fecha %s", job.parcel_id, obs_date)
             else:
                 new_kpi = Kpi(
                     parcel_id=job.parcel_id,
@@ -418,14 +432,14 @@ async def webhook_job_completed(
                     satellite_source="sentinel2",
                 )
                 db.add(new_kpi)
-                db.commit()
+                await db.commit()
                 kpi_created = True
-                print(f"✅ KPI auto-creado para parcela {job.parcel_id} fecha {obs_date}")
+                logger.info("✅ KPI auto-creado para parcela %s fecha %s", job.parcel_id, obs_date)
 
-        except Exception as e:
-            print(f"⚠️ Error creando KPI para job {payload.job_id}: {e}")
-            print(traceback.format_exc())
-            db.rollback()
+        except Exception:
+            logger.exception("⚠️ Error creando KPI para job %s", payload.job_id)
+            await db.rollback()
+            await db.refresh(job)
 
     # ── 4. Respuesta ──
     pheno_info = ""
@@ -449,6 +463,8 @@ async def webhook_job_completed(
         extras.append(f"recs={len(payload.recommendations_json)}")
     extras_str = f" | {', '.join(extras)}" if extras else ""
 
+    await invalidate_client_dashboard(job.client_id)
+
     return MessageResponse(
         message=f"Job {payload.job_id} actualizado a {payload.status}{pheno_info}{extras_str}"
     )
@@ -461,7 +477,7 @@ async def webhook_job_completed(
 @router.get("/latest-recommendations")
 async def get_latest_recommendations(
     client_email: str = Query(..., description="Email del cliente"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_webhook)
 ):
     """
@@ -474,8 +490,8 @@ async def get_latest_recommendations(
       - report_type: tipo del informe de origen (baseline/biweekly)
       - report_date: fecha de generación del informe
     """
-    client = db.query(Client).filter(Client.email == client_email).first()
-    if not client:
+    client_id = await _first(db, select(Client.id).where(Client.email_matches(client_email)))
+    if not client_id:
         return {
             "recommendations": [],
             "report_type": None,
@@ -483,14 +499,14 @@ async def get_latest_recommendations(
             "message": f"Cliente no encontrado: {client_email}"
         }
 
-    latest_report = (
-        db.query(Report)
-        .filter(
-            Report.client_id == client.id,
+    latest_report = await _first(
+        db,
+        select(Report)
+        .where(
+            Report.client_id == client_id,
             Report.recommendations_json.isnot(None)
         )
         .order_by(desc(Report.generated_at))
-        .first()
     )
 
     if not latest_report or not latest_report.recommendations_json:
@@ -520,10 +536,10 @@ async def get_latest_recommendations(
 @router.get("/resolve-parcel")
 async def resolve_parcel_by_email(
     email: str = Query(..., description="Email del cliente"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_webhook)
 ):
-    client_id, parcel_id = resolve_client_and_parcel(db, email)
+    client_id, parcel_id = await resolve_client_and_parcel(db, email)
     if not client_id:
         raise HTTPException(status_code=404, detail=f"Cliente no encontrado: {email}")
     if not parcel_id:
@@ -538,47 +554,47 @@ async def resolve_parcel_by_email(
 @router.post("/kpis", response_model=MessageResponse)
 async def webhook_kpis(
     payload: WebhookKpiBatch,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_webhook)
 ):
-    parcel = db.query(Parcel).filter(Parcel.id == payload.parcel_id).first()
+    parcel = await _first(db, select(Parcel).where(Parcel.id == payload.parcel_id))
     if not parcel:
         raise HTTPException(status_code=404, detail=f"Parcela {payload.parcel_id} no encontrada")
 
     job_uuid = None
     if payload.job_id:
-        job = db.query(Job).filter(Job.job_id == payload.job_id).first()
-        if job:
-            job_uuid = job.id
+        job_uuid = await _first(db, select(Job.id).where(Job.job_id == payload.job_id))
+
+    # Una fila por fecha: ON CONFLICT no admite tocar la misma fila dos veces.
+    # Fechas repetidas en el batch se fusionan (gana el último valor no nulo).
+    rows_by_date = {}
+    for values in _KPI_BATCH_ADAPTER.dump_python(payload.kpis):
+        row = rows_by_date.setdefault(values['observation_date'], values)
+        if row is not values:
+            row.update({field: value for field, value in values.items() if value is not None})
+
+    rows = [
+        {**values, 'parcel_id': payload.parcel_id, 'job_id': job_uuid}
+        for values in rows_by_date.values()
+    ]
 
     inserted = 0
-    updated = 0
-
-    for kpi_data in payload.kpis:
-        existing = db.query(Kpi).filter(
-            Kpi.parcel_id == payload.parcel_id,
-            Kpi.observation_date == kpi_data.observation_date
-        ).first()
-
-        if existing:
-            for field, value in kpi_data.model_dump().items():
-                if value is not None:
-                    setattr(existing, field, value)
-            if job_uuid:
-                existing.job_id = job_uuid
-            updated += 1
-        else:
-            kpi = Kpi(
-                parcel_id=payload.parcel_id,
-                job_id=job_uuid,
-                **kpi_data.model_dump()
-            )
-            db.add(kpi)
-            inserted += 1
-
-        db.flush()
-
-    db.commit()
+    if rows:
+        stmt = pg_insert(Kpi).values(rows)
+        # En KPIs existentes solo se pisan los campos que vienen informados
+        stmt = stmt.on_conflict_do_update(
+            constraint='unique_parcel_date',
+            set_={
+                column: func.coalesce(stmt.excluded[column], Kpi.__table__.c[column])
+                for column in rows[0]
+                if column not in ('parcel_id', 'observation_date')
+            },
+        ).returning(literal_column("xmax = 0"))
+        inserted = sum((await db.execute(stmt)).scalars().all())
+    updated = len(rows) - inserted
+
+    await db.commit()
+    await invalidate_client_dashboard(parcel.client_id)
 
     return MessageResponse(
         message=f"KPIs procesados: {inserted} insertados, {updated} actualizados"
@@ -597,18 +613,18 @@ class ReportSentPayload(BaseModel):
 @router.post("/report-sent", response_model=MessageResponse)
 async def webhook_report_sent(
     payload: ReportSentPayload,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_webhook)
 ):
-    job = db.query(Job).filter(Job.job_id == payload.job_id).first()
+    job = await _first(db, select(Job).where(Job.job_id == payload.job_id))
     if job:
         job.report_sent = True
-        db.commit()
-        report = db.query(Report).filter(Report.job_id == job.id).first()
+        await db.commit()
+        report = await _first(db, select(Report).where(Report.job_id == job.id))
         if report:
             report.sent_at = datetime.utcnow()
             report.sent_to = payload.sent_to
-            db.commit()
+            await db.commit()
     return MessageResponse(message=f"Report {payload.job_id} marcado como enviado")
 
 
@@ -632,16 +648,16 @@ class ClientCreatedPayload(BaseModel):
 @router.post("/client-created", response_model=MessageResponse)
 async def webhook_client_created(
     payload: ClientCreatedPayload,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     _: bool = Depends(verify_webhook)
 ):
-    existing = db.query(Client).filter(Client.email == payload.email).first()
+    existing = await _first(db, select(Client.id).where(Client.email_matches(payload.email)))
     if existing:
         return MessageResponse(message=f"Cliente {payload.email} ya existe")
 
     password_hash = None
     if payload.password:
-        password_hash = pwd_context.hash(payload.password)
+        password_hash = await hash_password(payload.password)
 
     client = Client(
         email=payload.email,
@@ -662,8 +678,8 @@ async def webhook_client_created(
         client.roi_geojson = roi_geojson
 
     db.add(client)
-    db.commit()
-    db.refresh(client)
+    await db.commit()
+    await db.refresh(client)
 
     if roi_geojson:
         parcel = Parcel(
@@ -674,7 +690,7 @@ async def webhook_client_created(
             roi_geojson=roi_geojson
         )
         db.add(parcel)
-        db.commit()
+        await db.commit()
 
     return MessageResponse(message=f"Cliente {payload.email} creado con éxito")
 
@@ -702,34 +718,37 @@ class PacCheckResponse(BaseModel):
     kpis_evaluated: int
     checked_at: str
 
+    class Config:
+        frozen = True
+
 
 @router.get("/pac-check", response_model=PacCheckResponse)
 async def pac_check(
     parcel_id: str = Query(..., description="UUID de la parcela a evaluar"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     from app.models.kpi import Kpi
     from app.models.parcel import Parcel
     from app.models.client import Client
 
-    parcel = db.query(Parcel).filter(
+    parcel = await _first(db, select(Parcel).where(
         Parcel.id == parcel_id,
         Parcel.is_active == True
-    ).first()
+    ))
 
     if not parcel:
         raise HTTPException(status_code=404, detail=f"Parcela no encontrada o inactiva: {parcel_id}")
 
-    client = db.query(Client).filter(Client.id == parcel.client_id).first()
-    client_email = client.email if client else "desconocido@muorbita.com"
+    client_email = await _first(
+        db, select(Client.email).where(Client.id == parcel.client_id)
+    ) or "desconocido@muorbita.com"
 
-    recent_kpis = (
-        db.query(Kpi)
-        .filter(Kpi.parcel_id == parcel_id, Kpi.ndvi_mean.isnot(None))
+    recent_kpis = (await db.execute(
+        select(Kpi)
+        .where(Kpi.parcel_id == parcel_id, Kpi.ndvi_mean.isnot(None))
         .order_by(desc(Kpi.observation_date))
         .limit(2)
-        .all()
-    )
+    )).scalars().all()
 
     if not recent_kpis:
         return PacCheckResponse(
@@ -820,7 +839,7 @@ class PacInternalRequest(BaseModel):
 async def generate_pac_internal(
     req: PacInternalRequest,
     x_internal_key: str = "",
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     import os, base64 as _b64
     from datetime import date
@@ -836,21 +855,21 @@ async def generate_pac_internal(
         raise HTTPException(status_code=403, detail="No autorizado")
 
     # ── v4.7: Resolver client PRIMERO, luego parcel ──
-    client = db.query(Client).filter(Client.email == req.client_email).first()
+    client = await _first(db, select(Client).where(Client.email_matches(req.client_email)))
     if not client:
         raise HTTPException(status_code=404, detail=f"Cliente no encontrado: {req.client_email}")
 
     if req.parcel_id:
-        parcel = db.query(Parcel).filter(
+        parcel = await _first(db, select(Parcel).where(
             Parcel.id == req.parcel_id,
             Parcel.is_active == True
-        ).first()
+        ))
     else:
         # Auto-resolve: primera parcela activa del cliente
-        parcel = db.query(Parcel).filter(
+        parcel = await _first(db, select(Parcel).where(
             Parcel.client_id == client.id,
             Parcel.is_active == True
-        ).first()
+        ))
 
     if not parcel:
         raise HTTPException(
@@ -862,13 +881,12 @@ async def generate_pac_internal(
     period_start = date(year - 1, 3, 1)
     period_end = date(year, 2, 28)
 
-    kpi_records_raw = (
-        db.query(Kpi)
-        .filter(Kpi.parcel_id == parcel.id, Kpi.observation_date >= period_start,
-                Kpi.observation_date <= period_end, Kpi.ndvi_mean.isnot(None))
+    kpi_records_raw = (await db.execute(
+        select(Kpi)
+        .where(Kpi.parcel_id == parcel.id, Kpi.observation_date >= period_start,
+               Kpi.observation_date <= period_end, Kpi.ndvi_mean.isnot(None))
         .order_by(Kpi.observation_date)
-        .all()
-    )
+    )).scalars().all()
 
     kpi_records = [
         {
@@ -900,17 +918,17 @@ async def generate_pac_internal(
         'kpi_records': kpi_records,
     }
 
-    result = generate_pac_report(pdf_data)
+    result = await run_in_threadpool(generate_pac_report, pdf_data)
     if not result['success']:
         raise HTTPException(status_code=500, detail=f"PDF error: {result.get('error')}")
 
-    last_job = (
-        db.query(Job).filter(Job.parcel_id == parcel.id)
-        .order_by(desc(Job.created_at)).first()
+    last_job_id = await _first(
+        db, select(Job.id).where(Job.parcel_id == parcel.id)
+        .order_by(desc(Job.created_at))
     )
 
     new_report = Report(
-        job_id=last_job.id if last_job else None,
+        job_id=last_job_id,
         client_id=client.id,
         report_type=req.report_type,
         period_start=period_start,
@@ -927,8 +945,9 @@ async def generate_pac_internal(
         }
     )
     db.add(new_report)
-    db.commit()
-    db.refresh(new_report)
+    await db.commit()
+    await db.refresh(new_report)
+    await invalidate_client_dashboard(client.id)
 
     return {
         'success': True,
@@ -946,7 +965,7 @@ async def generate_pac_internal(
 @router.get("/clients-active")
 async def get_active_clients_for_pac(
     x_internal_key: str = Query(""),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     import os
     from app.models.parcel import Parcel
@@ -956,13 +975,15 @@ async def get_active_clients_for_pac(
     if x_internal_key != internal_key:
         raise HTTPException(status_code=403, detail="No autorizado")
 
-    clients = db.query(Client).filter(Client.status == "active").all()
+    clients = (await db.execute(
+        select(Client).where(Client.status == "active")
+    )).scalars().all()
 
     result = []
     for client in clients:
-        parcel = db.query(Parcel).filter(
+        parcel = await _first(db, select(Parcel).where(
             Parcel.client_id == client.id, Parcel.is_active == True
-        ).first()
+        ))
         if not parcel:
             continue
         result.append({
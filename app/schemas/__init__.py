@@ -8,7 +8,7 @@ v2.0 — Dashboard Professional Upgrade
 """
 
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Type, TypeVar
 from datetime import datetime, date
 from uuid import UUID
 
@@ -23,6 +23,9 @@ class TokenResponse(BaseModel):
     token_type: str = "bearer"
     expires_in: int
 
+    class Config:
+        frozen = True
+
 
 class TokenPayload(BaseModel):
     sub: str  # client_id
@@ -61,7 +64,7 @@ class PasswordChangeRequest(BaseModel):
 # ============================================================================
 
 class ClientBase(BaseModel):
-    email: EmailStr
+    email: str  # sin EmailStr: en respuestas el email viene de BD, ya validado
     client_name: str
     company: Optional[str] = None
     phone: Optional[str] = None
@@ -71,6 +74,7 @@ class ClientBase(BaseModel):
 
 
 class ClientCreate(ClientBase):
+    email: EmailStr  # entrada del usuario: aquí sí se valida
     password: Optional[str] = Field(None, min_length=8)
     google_id: Optional[str] = None
 
@@ -95,6 +99,7 @@ class ClientResponse(ClientBase):
     
     class Config:
         from_attributes = True
+        frozen = True
 
 
 class ClientSummary(BaseModel):
@@ -108,6 +113,9 @@ class ClientSummary(BaseModel):
     last_analysis_date: Optional[datetime] = None
     avg_ndvi: Optional[float] = None
 
+    class Config:
+        frozen = True
+
 
 # ============================================================================
 # PARCEL SCHEMAS
@@ -152,6 +160,7 @@ class ParcelResponse(ParcelBase):
     
     class Config:
         from_attributes = True
+        frozen = True
 
 
 class ParcelWithLatestKpi(ParcelResponse):
@@ -234,6 +243,7 @@ class KpiResponse(KpiBase):
     
     class Config:
         from_attributes = True
+        frozen = True
 
 
 class KpiTimeSeries(BaseModel):
@@ -249,6 +259,9 @@ class KpiTimeSeries(BaseModel):
     lst_mean: Optional[float] = None            # MODIS LST
     tmax_mean: Optional[float] = None           # ERA5 Tmax
     precip_mm: Optional[float] = None           # ERA5 precipitación
+    
+    class Config:
+        frozen = True
 
 
 # ============================================================================
@@ -311,6 +324,7 @@ class JobResponse(JobBase):
     
     class Config:
         from_attributes = True
+        frozen = True
 
 
 # ============================================================================
@@ -333,6 +347,7 @@ class ReportResponse(BaseModel):
     
     class Config:
         from_attributes = True
+        frozen = True
 
 
 # ============================================================================
@@ -368,6 +383,9 @@ class DashboardSummary(BaseModel):
     risk_hydric_level: Optional[str] = None                 # "Bajo" | "Moderado" | "Alto"
     risk_thermal_level: Optional[str] = None                # "Bajo" | "Moderado" | "Alto"
     risk_heterogeneity_level: Optional[str] = None          # "Baja" | "Media" | "Alta"
+    
+    class Config:
+        frozen = True
 
 
 class DashboardAlert(BaseModel):
@@ -421,6 +439,9 @@ class MessageResponse(BaseModel):
     message: str
     success: bool = True
 
+    class Config:
+        frozen = True
+
 
 class PaginatedResponse(BaseModel):
     items: List[Any]
@@ -428,3 +449,29 @@ class PaginatedResponse(BaseModel):
     page: int
     page_size: int
     pages: int
+
+    class Config:
+        frozen = True
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+_MISSING = object()
+
+
+def construct_from_row(model: Type[ModelT], row: Any) -> ModelT:
+    """
+    model_construct desde una fila/objeto de BD, sin validar campo a campo.
+    Solo para datos de confianza (columnas ya tipadas por la query); el
+    response_model del endpoint sigue validando la salida una vez.
+    Los atributos que no trae la fila toman el default del modelo.
+    """
+    values = {}
+    for name in model.model_fields:
+        value = getattr(row, name, _MISSING)
+        if value is not _MISSING:
+            values[name] = value
+    return model.model_construct(**values)
@@ -3,30 +3,71 @@ Mu.Orbita API - Auth Service
 Maneja JWT, password hashing, y Google OAuth
 """
 
-from datetime import datetime, timedelta
+from datetime import timedelta
+from functools import lru_cache
 from typing import Optional, Tuple
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from urllib.parse import urlencode
+import jwt
+import bcrypt
+from cachetools import TTLCache
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
 import httpx
 
 from app.config import settings
+from app.services.http_client import get_http_client
+from app.services.redis_client import get_redis, mark_redis_down
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger("muorbita")
+
+# Password hashing (coste explícito: 12 rondas ≈ 200-300 ms por hash)
+BCRYPT_ROUNDS = 12
+# bcrypt solo usa los primeros 72 bytes (passlib truncaba igual, en silencio)
+BCRYPT_MAX_PASSWORD_BYTES = 72
 
 # Google OAuth endpoints
 GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
 GOOGLE_USERINFO_URL = "https://www.googleapis.com/oauth2/v2/userinfo"
+GOOGLE_TIMEOUT_SECONDS = 10
+GOOGLE_MAX_RETRIES = 3
+GOOGLE_BACKOFF_BASE_SECONDS = 0.5
+
+# Cache de access tokens ya verificados.
+# Clave: sha256 truncado del token (nunca el token en claro).
+TOKEN_CACHE_TTL_SECONDS = 30
+_token_cache: TTLCache = TTLCache(maxsize=10_000, ttl=TOKEN_CACHE_TTL_SECONDS)
+_token_cache_lock = threading.Lock()
+
+
+# Clave HMAC y algoritmos resueltos una sola vez al importar el módulo
+_JWT_KEY = settings.jwt_secret_key.encode()
+_JWT_ALGORITHMS = [settings.jwt_algorithm]
+
+# Caducidades en segundos: exp se emite como timestamp POSIX entero
+_ACCESS_EXP_SECONDS = settings.access_token_expire_minutes * 60
+_REFRESH_EXP_SECONDS = settings.refresh_token_expire_days * 86400
+
+
+def _password_bytes(password: str) -> bytes:
+    return password.encode("utf-8")[:BCRYPT_MAX_PASSWORD_BYTES]
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifica password contra hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verifica password contra hash (los $2b$ que generaba passlib valen igual)"""
+    try:
+        return bcrypt.checkpw(_password_bytes(plain_password), hashed_password.encode("ascii"))
+    except ValueError:
+        # Hash con formato inválido en BD
+        return False
 
 
 def get_password_hash(password: str) -> str:
     """Genera hash bcrypt de password"""
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt(BCRYPT_ROUNDS)).decode("ascii")
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -36,17 +77,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode = data.copy()
     
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = int(time.time() + expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.access_token_expire_minutes)
+        expire = int(time.time()) + _ACCESS_EXP_SECONDS
     
     to_encode.update({"exp": expire, "type": "access"})
     
-    return jwt.encode(
-        to_encode, 
-        settings.jwt_secret_key, 
-        algorithm=settings.jwt_algorithm
-    )
+    return jwt.encode(to_encode, _JWT_KEY, algorithm=settings.jwt_algorithm)
 
 
 def create_refresh_token(data: dict) -> str:
@@ -54,14 +91,9 @@ def create_refresh_token(data: dict) -> str:
     Crea JWT refresh token (más duración)
     """
     to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(days=settings.refresh_token_expire_days)
-    to_encode.update({"exp": expire, "type": "refresh"})
+    to_encode.update({"exp": int(time.time()) + _REFRESH_EXP_SECONDS, "type": "refresh"})
     
-    return jwt.encode(
-        to_encode, 
-        settings.jwt_secret_key, 
-        algorithm=settings.jwt_algorithm
-    )
+    return jwt.encode(to_encode, _JWT_KEY, algorithm=settings.jwt_algorithm)
 
 
 def create_tokens(client_id: str, email: str) -> Tuple[str, str]:
@@ -76,19 +108,23 @@ def create_tokens(client_id: str, email: str) -> Tuple[str, str]:
     return access_token, refresh_token
 
 
+# Claims obligatorios, validados dentro del único decode verificado
+TOKEN_DECODE_OPTIONS = {"require": ["exp", "sub"]}
+
+
 def decode_token(token: str) -> Optional[dict]:
     """
-    Decodifica y valida JWT token
+    Decodifica y valida JWT token en una sola pasada (firma + exp + sub)
     Retorna payload o None si inválido
     """
     try:
-        payload = jwt.decode(
-            token, 
-            settings.jwt_secret_key, 
-            algorithms=[settings.jwt_algorithm]
+        return jwt.decode(
+            token,
+            _JWT_KEY,
+            algorithms=_JWT_ALGORITHMS,
+            options=TOKEN_DECODE_OPTIONS,
         )
-        return payload
-    except JWTError:
+    except jwt.PyJWTError:
         return None
 
 
@@ -102,6 +138,63 @@ def verify_access_token(token: str) -> Optional[dict]:
     return None
 
 
+def _token_cache_key(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()[:16]
+
+
+async def _redis_get_token(key: bytes) -> Optional[dict]:
+    client = get_redis()
+    if client is None:
+        return None
+    try:
+        raw = await client.get(f"jwt:{key.hex()}")
+    except Exception as e:
+        mark_redis_down(e)
+        return None
+    return json.loads(raw) if raw else None
+
+
+async def _redis_set_token(key: bytes, payload: dict, ttl_seconds: int) -> None:
+    client = get_redis()
+    if client is None or ttl_seconds <= 0:
+        return
+    try:
+        await client.setex(f"jwt:{key.hex()}", ttl_seconds, json.dumps(payload))
+    except Exception as e:
+        mark_redis_down(e)
+
+
+async def verify_access_token_cached(token: str) -> Optional[dict]:
+    """
+    Igual que verify_access_token, pero reutiliza el payload verificado
+    durante TOKEN_CACHE_TTL_SECONDS (nunca más allá del exp del token).
+    Primero cache local del proceso, luego Redis (compartido entre workers).
+    Solo se cachean tokens válidos.
+    """
+    key = _token_cache_key(token)
+    now = time.time()
+
+    with _token_cache_lock:
+        entry = _token_cache.get(key)
+    if entry is not None:
+        payload, expires_at = entry
+        if now < expires_at:
+            return payload
+
+    payload = await _redis_get_token(key)
+    from_redis = payload is not None
+    if not from_redis:
+        payload = verify_access_token(token)
+
+    if payload:
+        expires_at = min(now + TOKEN_CACHE_TTL_SECONDS, payload.get("exp", now))
+        with _token_cache_lock:
+            _token_cache[key] = (payload, expires_at)
+        if not from_redis:
+            await _redis_set_token(key, payload, int(expires_at - now))
+    return payload
+
+
 def verify_refresh_token(token: str) -> Optional[dict]:
     """
     Verifica que sea refresh token válido
@@ -112,59 +205,84 @@ def verify_refresh_token(token: str) -> Optional[dict]:
     return None
 
 
+def _google_retry_delay(response: httpx.Response, attempt: int) -> float:
+    """Respeta Retry-After si Google lo envía; si no, backoff exponencial"""
+    retry_after = response.headers.get("retry-after")
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return GOOGLE_BACKOFF_BASE_SECONDS * (2 ** attempt)
+
+
+async def _google_request(method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Petición a Google con el cliente HTTP compartido (reutiliza la conexión TLS).
+    Solo los GET (idempotentes) se reintentan con backoff exponencial ante
+    429/5xx; el resto va en un único intento.
+    """
+    client = get_http_client()
+    attempts = GOOGLE_MAX_RETRIES if method == "GET" else 1
+    for attempt in range(attempts):
+        response = await client.request(method, url, timeout=GOOGLE_TIMEOUT_SECONDS, **kwargs)
+        if response.status_code != 429 and response.status_code < 500:
+            break
+        if attempt < attempts - 1:
+            await asyncio.sleep(_google_retry_delay(response, attempt))
+    return response
+
+
 async def exchange_google_code(code: str) -> Optional[dict]:
     """
-    Intercambia authorization code de Google por tokens
-    """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(
-                GOOGLE_TOKEN_URL,
-                data={
-                    "code": code,
-                    "client_id": settings.google_client_id,
-                    "client_secret": settings.google_client_secret,
-                    "redirect_uri": settings.google_redirect_uri,
-                    "grant_type": "authorization_code",
-                }
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Google token exchange failed: {response.text}")
-                return None
-                
-        except Exception as e:
-            print(f"Google token exchange error: {e}")
-            return None
+    Intercambia authorization code de Google por tokens.
+    Un solo intento: el code es de un solo uso y, si Google lo consumió antes
+    de responder 5xx, el reintento daría invalid_grant y ocultaría el error.
+    """
+    try:
+        response = await _google_request(
+            "POST",
+            GOOGLE_TOKEN_URL,
+            data={
+                "code": code,
+                "client_id": settings.google_client_id,
+                "client_secret": settings.google_client_secret,
+                "redirect_uri": settings.google_redirect_uri,
+                "grant_type": "authorization_code",
+            }
+        )
+    except httpx.HTTPError as e:
+        logger.warning("Google token exchange error: %s", e)
+        return None
+
+    if response.status_code == 200:
+        return response.json()
+    logger.warning("Google token exchange failed: %s", response.text)
+    return None
 
 
 async def get_google_user_info(access_token: str) -> Optional[dict]:
     """
     Obtiene info del usuario de Google usando access token
     """
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(
-                GOOGLE_USERINFO_URL,
-                headers={"Authorization": f"Bearer {access_token}"}
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            else:
-                print(f"Google userinfo failed: {response.text}")
-                return None
-                
-        except Exception as e:
-            print(f"Google userinfo error: {e}")
-            return None
+    try:
+        response = await _google_request(
+            "GET",
+            GOOGLE_USERINFO_URL,
+            headers={"Authorization": f"Bearer {access_token}"}
+        )
+    except httpx.HTTPError as e:
+        logger.warning("Google userinfo error: %s", e)
+        return None
+
+    if response.status_code == 200:
+        return response.json()
+    logger.warning("Google userinfo failed: %s", response.text)
+    return None
 
 
+@lru_cache(maxsize=1)
 def get_google_auth_url() -> str:
     """
-    Genera URL para iniciar flujo OAuth con Google
+    Genera URL para iniciar flujo OAuth con Google.
+    Solo depende de settings: se construye una vez y se reutiliza.
     """
     params = {
         "client_id": settings.google_client_id,
@@ -175,5 +293,5 @@ def get_google_auth_url() -> str:
         "prompt": "consent",
     }
     
-    query_string = "&".join(f"{k}={v}" for k, v in params.items())
-    return f"https://accounts.google.com/o/oauth2/v2/auth?{query_string}"
+    # urlencode escapa redirect_uri y el scope (el join a mano no lo hacía)
+    return f"https://accounts.google.com/o/oauth2/v2/auth?{urlencode(params)}"
@@ -0,0 +1,79 @@
+"""
+Mu.Orbita API - Auth Pool
+Ejecuta bcrypt (hash/verify) en un thread pool dedicado para no bloquear
+el event loop. Con el pool saturado y demasiadas peticiones en cola
+responde 503 + Retry-After en lugar de acumular latencia.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import time
+
+from fastapi import HTTPException, status
+
+from app.services.auth import get_password_hash, verify_password
+
+try:
+    from prometheus_client import Gauge, Histogram
+except ImportError:
+    Gauge = Histogram = None
+
+BCRYPT_MAX_WORKERS = 2 * (os.cpu_count() or 1)
+BCRYPT_MAX_QUEUE = 500
+
+BCRYPT_POOL = ThreadPoolExecutor(max_workers=BCRYPT_MAX_WORKERS, thread_name_prefix="bcrypt")
+_inflight = asyncio.Semaphore(BCRYPT_MAX_WORKERS)
+_queue_length = 0
+
+if Gauge is not None:
+    bcrypt_queue_length = Gauge(
+        "bcrypt_queue_length", "Peticiones bcrypt esperando un worker libre"
+    )
+    bcrypt_processing_duration_ms = Histogram(
+        "bcrypt_processing_duration_ms", "Duración de hash/verify bcrypt (ms)",
+        buckets=(25, 50, 100, 200, 400, 800, 1600),
+    )
+else:
+    bcrypt_queue_length = bcrypt_processing_duration_ms = None
+
+
+def _set_queue_length(value: int) -> None:
+    global _queue_length
+    _queue_length = value
+    if bcrypt_queue_length is not None:
+        bcrypt_queue_length.set(value)
+
+
+async def _run_bcrypt(fn, *args):
+    if _inflight.locked() and _queue_length >= BCRYPT_MAX_QUEUE:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, inténtalo de nuevo",
+            headers={"Retry-After": "1"},
+        )
+
+    _set_queue_length(_queue_length + 1)
+    try:
+        await _inflight.acquire()
+    finally:
+        _set_queue_length(_queue_length - 1)
+
+    start = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(BCRYPT_POOL, fn, *args)
+    finally:
+        _inflight.release()
+        if bcrypt_processing_duration_ms is not None:
+            bcrypt_processing_duration_ms.observe((time.perf_counter() - start) * 1000)
+
+
+async def hash_password(password: str) -> str:
+    """get_password_hash fuera del event loop"""
+    return await _run_bcrypt(get_password_hash, password)
+
+
+async def verify(plain_password: str, hashed_password: str) -> bool:
+    """verify_password fuera del event loop"""
+    return await _run_bcrypt(verify_password, plain_password, hashed_password)
@@ -23,7 +23,8 @@ import io
 import math
 import base64
 import urllib.request
-from typing import Dict, List, Tuple, Optional
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Tuple, Optional
 
 
 # ============================================================================
@@ -267,48 +268,56 @@ def _dim_exterior(basemap, parcel_bounds: Dict, geo_bounds: Dict,
 # LEYENDA
 # ============================================================================
 
-VIZ_PALETTES = {
-    'NDVI': {
-        'min': 0.0, 'max': 0.8,
-        'palette': ['8B0000', 'FF0000', 'FF6347', 'FFA500', 'FFFF00',
-                    'ADFF2F', '7CFC00', '32CD32', '228B22', '006400'],
-        'label': 'NDVI (Vigor Vegetativo)', 'unit': ''
-    },
-    'NDWI': {
-        'min': -0.3, 'max': 0.4,
-        'palette': ['8B4513', 'D2691E', 'F4A460', 'FFF8DC', 'E0FFFF',
-                    '87CEEB', '4682B4', '0000CD', '00008B'],
-        'label': 'NDWI (Estado Hídrico)', 'unit': ''
-    },
-    'EVI': {
-        'min': 0.0, 'max': 0.6,
-        'palette': ['8B0000', 'CD5C5C', 'F08080', 'FFFFE0', 'ADFF2F',
-                    '7FFF00', '32CD32', '228B22', '006400'],
-        'label': 'EVI (Productividad)', 'unit': ''
-    },
-    'NDCI': {
-        'min': -0.2, 'max': 0.6,
-        'palette': ['8B0000', 'FF6347', 'FFA500', 'FFFF00', 'ADFF2F',
-                    '7CFC00', '32CD32', '228B22', '006400'],
-        'label': 'NDCI (Clorofila)', 'unit': ''
-    },
-    'SAVI': {
-        'min': 0.0, 'max': 0.8,
-        'palette': ['8B0000', 'FF0000', 'FF6347', 'FFA500', 'FFFF00',
-                    'ADFF2F', '7CFC00', '32CD32', '228B22', '006400'],
-        'label': 'SAVI (Vigor Ajustado Suelo)', 'unit': ''
-    },
-    'VRA': {
-        'min': 0, 'max': 2,
-        'palette': ['e74c3c', 'f1c40f', '27ae60'],
-        'label': 'Zonas de Manejo Variable', 'unit': ''
-    },
-    'LST': {
-        'min': 15, 'max': 45,
-        'palette': ['0000FF', '00FFFF', '00FF00', 'FFFF00', 'FF0000'],
-        'label': 'Temperatura Superficial', 'unit': '°C'
-    }
-}
+class Viz(NamedTuple):
+    min: float
+    max: float
+    palette: Tuple[str, ...]
+    label: str
+    unit: str
+
+
+VIZ_PALETTES: Mapping[str, Viz] = MappingProxyType({
+    'NDVI': Viz(
+        min=0.0, max=0.8,
+        palette=('8B0000', 'FF0000', 'FF6347', 'FFA500', 'FFFF00',
+                 'ADFF2F', '7CFC00', '32CD32', '228B22', '006400'),
+        label='NDVI (Vigor Vegetativo)', unit=''
+    ),
+    'NDWI': Viz(
+        min=-0.3, max=0.4,
+        palette=('8B4513', 'D2691E', 'F4A460', 'FFF8DC', 'E0FFFF',
+                 '87CEEB', '4682B4', '0000CD', '00008B'),
+        label='NDWI (Estado Hídrico)', unit=''
+    ),
+    'EVI': Viz(
+        min=0.0, max=0.6,
+        palette=('8B0000', 'CD5C5C', 'F08080', 'FFFFE0', 'ADFF2F',
+                 '7FFF00', '32CD32', '228B22', '006400'),
+        label='EVI (Productividad)', unit=''
+    ),
+    'NDCI': Viz(
+        min=-0.2, max=0.6,
+        palette=('8B0000', 'FF6347', 'FFA500', 'FFFF00', 'ADFF2F',
+                 '7CFC00', '32CD32', '228B22', '006400'),
+        label='NDCI (Clorofila)', unit=''
+    ),
+    'SAVI': Viz(
+        min=0.0, max=0.8,
+        palette=('8B0000', 'FF0000', 'FF6347', 'FFA500', 'FFFF00',
+                 'ADFF2F', '7CFC00', '32CD32', '228B22', '006400'),
+        label='SAVI (Vigor Ajustado Suelo)', unit=''
+    ),
+    'VRA': Viz(
+        min=0, max=2,
+        palette=('e74c3c', 'f1c40f', '27ae60'),
+        label='Zonas de Manejo Variable', unit=''
+    ),
+    'LST': Viz(
+        min=15, max=45,
+        palette=('0000FF', '00FFFF', '00FF00', 'FFFF00', 'FF0000'),
+        label='Temperatura Superficial', unit='°C'
+    ),
+})
 
 
 def _add_legend(img, index_name: str, mean_value: float = None):
@@ -338,7 +347,7 @@ def _add_legend(img, index_name: str, mean_value: float = None):
     y0 = img.height + 8
     accent, dark, muted = (139, 69, 19), (51, 51, 51), (136, 136, 136)
     
-    label = viz.get('label', index_name)
+    label = viz.label
     draw.text((pad, y0), label, fill=accent, font=ft)
     if mean_value is not None:
         try:
@@ -348,7 +357,7 @@ def _add_legend(img, index_name: str, mean_value: float = None):
         draw.text((pad + tw + 20, y0 + 1), f"Media: {mean_value:.2f}", fill=dark, font=fv)
     
     bar_y, bar_x = y0 + 24, pad
-    colors = [tuple(int(h[i:i+2], 16) for i in (0, 2, 4)) for h in viz['palette']]
+    colors = [tuple(int(h[i:i+2], 16) for i in (0, 2, 4)) for h in viz.palette]
     n = len(colors)
     for x in range(bar_w):
         t = x / bar_w
@@ -359,9 +368,9 @@ def _add_legend(img, index_name: str, mean_value: float = None):
         draw.rectangle([bar_x + x, bar_y, bar_x + x + 1, bar_y + bar_h], fill=c)
     draw.rectangle([bar_x, bar_y, bar_x + bar_w, bar_y + bar_h], outline=(100, 100, 100), width=1)
     
-    unit = viz.get('unit', '')
-    draw.text((bar_x, bar_y + bar_h + 3), f"{viz['min']}{unit}", fill=muted, font=fs)
-    mx_txt = f"{viz['max']}{unit}"
+    unit = viz.unit
+    draw.text((bar_x, bar_y + bar_h + 3), f"{viz.min}{unit}", fill=muted, font=fs)
+    mx_txt = f"{viz.max}{unit}"
     try:
         mx_w = draw.textbbox((0, 0), mx_txt, font=fs)[2]
     except AttributeError:
@@ -369,9 +378,9 @@ def _add_legend(img, index_name: str, mean_value: float = None):
     draw.text((bar_x + bar_w - mx_w, bar_y + bar_h + 3), mx_txt, fill=muted, font=fs)
     
     if mean_value is not None:
-        rng = viz['max'] - viz['min']
+        rng = viz.max - viz.min
         if rng > 0:
-            t = max(0, min(1, (mean_value - viz['min']) / rng))
+            t = max(0, min(1, (mean_value - viz.min) / rng))
             mx = bar_x + int(t * bar_w)
             draw.polygon([(mx, bar_y - 2), (mx - 6, bar_y - 8), (mx + 6, bar_y - 8)], fill=dark)
     
@@ -0,0 +1,76 @@
+"""
+Mu.Orbita API - Client Cache
+Cache de corta duración del cliente autenticado para no hacer
+un SELECT a Neon en cada request protegida.
+"""
+
+from types import SimpleNamespace
+from typing import Optional
+from cachetools import TTLCache
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+import asyncio
+import threading
+import weakref
+
+from app.models.client import Client
+
+CLIENT_CACHE_TTL_SECONDS = 30
+
+# Campos que usan los endpoints autenticados (ClientResponse + status).
+# Sin password_hash ni columnas JSONB.
+CACHED_CLIENT_FIELDS = (
+    "id", "email", "client_name", "company", "phone",
+    "hectares", "crop_type", "location", "status",
+    "subscription_tier", "subscription_status", "avatar_url",
+    "created_at", "last_login_at",
+)
+
+_CACHED_CLIENT_COLUMNS = tuple(getattr(Client, field) for field in CACHED_CLIENT_FIELDS)
+
+client_cache: TTLCache = TTLCache(maxsize=10_000, ttl=CLIENT_CACHE_TTL_SECONDS)
+_client_cache_lock = threading.Lock()
+
+# Un lock por cliente: las requests paralelas de una misma carga del
+# dashboard esperan a la primera en lugar de lanzar N SELECT iguales.
+_client_load_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+async def get_client_cached(db: AsyncSession, client_id: str) -> Optional[SimpleNamespace]:
+    """
+    Devuelve un snapshot desacoplado de la sesión (SimpleNamespace) del cliente.
+    Solo consulta la BD si no está en cache.
+    """
+    key = str(client_id)
+    with _client_cache_lock:
+        cached = client_cache.get(key)
+    if cached is not None:
+        return cached
+
+    load_lock = _client_load_locks.get(key)
+    if load_lock is None:
+        load_lock = _client_load_locks[key] = asyncio.Lock()
+
+    async with load_lock:
+        with _client_cache_lock:
+            cached = client_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Solo las columnas necesarias: evita hidratar el ORM y los JSONB
+        row = (await db.execute(
+            select(*_CACHED_CLIENT_COLUMNS).where(Client.id == client_id).limit(1)
+        )).first()
+        if row is None:
+            return None
+
+        snapshot = SimpleNamespace(**row._asdict())
+        with _client_cache_lock:
+            client_cache[key] = snapshot
+        return snapshot
+
+
+def invalidate_client(client_id) -> None:
+    """Elimina el cliente de la cache (logout, cambios de perfil/estado)"""
+    with _client_cache_lock:
+        client_cache.pop(str(client_id), None)
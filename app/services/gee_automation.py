@@ -50,6 +50,8 @@ import math
 import base64
 import urllib.request
 from datetime import datetime, timedelta
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Tuple
 
 # ============================================================================
 # INICIALIZACIÓN GEE
@@ -79,48 +81,56 @@ if not initialize_gee():
 # PALETAS
 # ============================================================================
 
-VIZ_PALETTES = {
-    'NDVI': {
-        'min': 0.0, 'max': 0.8,
-        'palette': ['8B0000','FF0000','FF6347','FFA500','FFFF00',
-                    'ADFF2F','7CFC00','32CD32','228B22','006400'],
-        'label': 'NDVI (Vigor Vegetativo)', 'unit': ''
-    },
-    'NDWI': {
-        'min': -0.3, 'max': 0.4,
-        'palette': ['8B4513','D2691E','F4A460','FFF8DC','E0FFFF',
-                    '87CEEB','4682B4','0000CD','00008B'],
-        'label': 'NDWI (Estado Hídrico)', 'unit': ''
-    },
-    'EVI': {
-        'min': 0.0, 'max': 0.6,
-        'palette': ['8B0000','CD5C5C','F08080','FFFFE0','ADFF2F',
-                    '7FFF00','32CD32','228B22','006400'],
-        'label': 'EVI (Productividad)', 'unit': ''
-    },
-    'NDCI': {
-        'min': -0.2, 'max': 0.6,
-        'palette': ['8B0000','FF6347','FFA500','FFFF00','ADFF2F',
-                    '7CFC00','32CD32','228B22','006400'],
-        'label': 'NDCI (Clorofila)', 'unit': ''
-    },
-    'SAVI': {
-        'min': 0.0, 'max': 0.8,
-        'palette': ['8B0000','FF0000','FF6347','FFA500','FFFF00',
-                    'ADFF2F','7CFC00','32CD32','228B22','006400'],
-        'label': 'SAVI (Vigor Ajustado Suelo)', 'unit': ''
-    },
-    'VRA': {
-        'min': 0, 'max': 2,
-        'palette': ['e74c3c','f1c40f','27ae60'],
-        'label': 'Zonas de Manejo Variable', 'unit': ''
-    },
-    'LST': {
-        'min': 15, 'max': 45,
-        'palette': ['0000FF','00FFFF','00FF00','FFFF00','FF0000'],
-        'label': 'Temperatura Superficial', 'unit': '°C'
-    }
-}
+class Viz(NamedTuple):
+    min: float
+    max: float
+    palette: Tuple[str, ...]
+    label: str
+    unit: str
+
+
+VIZ_PALETTES: Mapping[str, Viz] = MappingProxyType({
+    'NDVI': Viz(
+        min=0.0, max=0.8,
+        palette=('8B0000','FF0000','FF6347','FFA500','FFFF00',
+                 'ADFF2F','7CFC00','32CD32','228B22','006400'),
+        label='NDVI (Vigor Vegetativo)', unit=''
+    ),
+    'NDWI': Viz(
+        min=-0.3, max=0.4,
+        palette=('8B4513','D2691E','F4A460','FFF8DC','E0FFFF',
+                 '87CEEB','4682B4','0000CD','00008B'),
+        label='NDWI (Estado Hídrico)', unit=''
+    ),
+    'EVI': Viz(
+        min=0.0, max=0.6,
+        palette=('8B0000','CD5C5C','F08080','FFFFE0','ADFF2F',
+                 '7FFF00','32CD32','228B22','006400'),
+        label='EVI (Productividad)', unit=''
+    ),
+    'NDCI': Viz(
+        min=-0.2, max=0.6,
+        palette=('8B0000','FF6347','FFA500','FFFF00','ADFF2F',
+                 '7CFC00','32CD32','228B22','006400'),
+        label='NDCI (Clorofila)', unit=''
+    ),
+    'SAVI': Viz(
+        min=0.0, max=0.8,
+        palette=('8B0000','FF0000','FF6347','FFA500','FFFF00',
+                 'ADFF2F','7CFC00','32CD32','228B22','006400'),
+        label='SAVI (Vigor Ajustado Suelo)', unit=''
+    ),
+    'VRA': Viz(
+        min=0, max=2,
+        palette=('e74c3c','f1c40f','27ae60'),
+        label='Zonas de Manejo Variable', unit=''
+    ),
+    'LST': Viz(
+        min=15, max=45,
+        palette=('0000FF','00FFFF','00FF00','FFFF00','FF0000'),
+        label='Temperatura Superficial', unit='°C'
+    ),
+})
 
 # ============================================================================
 # ARGUMENTOS
@@ -178,11 +188,11 @@ def get_bounds(roi):
 
 def get_leaflet_overlay_png(index_image_unclipped, roi, viz_params, dimensions=512):
     try:
-        viz_kw = {k: v for k, v in viz_params.items() if k in ('min','max','palette')}
-        index_clipped = index_image_unclipped.clip(roi).visualize(**viz_kw)
-        region_coords = roi.bounds().getInfo()['coordinates']
+        index_clipped = index_image_unclipped.clip(roi).visualize(
+            min=viz_params.min, max=viz_params.max, palette=list(viz_params.palette))
+        # La geometría va serializada en la petición del thumbnail: sin getInfo previo
         url = index_clipped.getThumbURL({
-            'region': region_coords, 'dimensions': dimensions, 'format': 'png'
+            'region': roi.bounds(), 'dimensions': dimensions, 'format': 'png'
         })
         req = urllib.request.Request(url)
         req.add_header('User-Agent', 'MuOrbita/5.9')
@@ -396,7 +406,7 @@ def _add_legend_pil(img, index_name, mean_value=None):
     y0 = img.height + 8
     accent, dark, muted = (139,69,19), (51,51,51), (136,136,136)
 
-    label = viz.get('label', index_name)
+    label = viz.label
     draw.text((pad, y0), label, fill=accent, font=ft)
     if mean_value is not None:
         try:
@@ -406,7 +416,7 @@ def _add_legend_pil(img, index_name, mean_value=None):
         draw.text((pad + tw + 20, y0 + 1), f"Media: {mean_value:.2f}", fill=dark, font=fv)
 
     bar_y, bar_x = y0 + 24, pad
-    colors = [tuple(int(h[i:i+2], 16) for i in (0,2,4)) for h in viz['palette']]
+    colors = [tuple(int(h[i:i+2], 16) for i in (0,2,4)) for h in viz.palette]
     n = len(colors)
     for x in range(bar_w):
         t = x / bar_w
@@ -417,9 +427,9 @@ def _add_legend_pil(img, index_name, mean_value=None):
         draw.rectangle([bar_x+x, bar_y, bar_x+x+1, bar_y+bar_h], fill=c)
     draw.rectangle([bar_x, bar_y, bar_x+bar_w, bar_y+bar_h], outline=(100,100,100), width=1)
 
-    unit = viz.get('unit', '')
-    draw.text((bar_x, bar_y + bar_h + 3), f"{viz['min']}{unit}", fill=muted, font=fs)
-    mx_txt = f"{viz['max']}{unit}"
+    unit = viz.unit
+    draw.text((bar_x, bar_y + bar_h + 3), f"{viz.min}{unit}", fill=muted, font=fs)
+    mx_txt = f"{viz.max}{unit}"
     try:
         mx_w = draw.textbbox((0,0), mx_txt, font=fs)[2]
     except AttributeError:
@@ -427,9 +437,9 @@ def _add_legend_pil(img, index_name, mean_value=None):
     draw.text((bar_x + bar_w - mx_w, bar_y + bar_h + 3), mx_txt, fill=muted, font=fs)
 
     if mean_value is not None:
-        rng = viz['max'] - viz['min']
+        rng = viz.max - viz.min
         if rng > 0:
-            t = max(0, min(1, (mean_value - viz['min']) / rng))
+            t = max(0, min(1, (mean_value - viz.min) / rng))
             mx = bar_x + int(t * bar_w)
             draw.polygon([(mx, bar_y-2), (mx-6, bar_y-8), (mx+6, bar_y-8)], fill=dark)
 
@@ -618,35 +628,35 @@ def get_modis_lst(roi, start_date, end_date):
 
 def calculate_vra_zones(composite_clipped, roi):
     try:
-        ndvi = composite_clipped.select('NDVI')
-        ndwi = composite_clipped.select('NDWI')
-        evi  = composite_clipped.select('EVI')
+        indices = composite_clipped.select(['NDVI', 'NDWI', 'EVI'])
+        ndvi = indices.select('NDVI')
+
+        # min/max de los tres índices en una sola reducción y un solo getInfo
+        ranges = indices.reduceRegion(
+            ee.Reducer.minMax(), roi, 10, maxPixels=1e9).getInfo()
 
         def normalize(img, name):
-            stats = img.reduceRegion(
-                ee.Reducer.minMax(), roi, 10, maxPixels=1e9).getInfo()
-            mn = stats.get(f'{name}_min', 0) or 0
-            mx = stats.get(f'{name}_max', 1) or 1
+            mn = ranges.get(f'{name}_min', 0) or 0
+            mx = ranges.get(f'{name}_max', 1) or 1
             if mx == mn:
                 mx = mn + 0.001
             return img.subtract(mn).divide(mx - mn).rename(name + '_norm')
 
         ndvi_n = normalize(ndvi, 'NDVI')
-        ndwi_n = normalize(ndwi, 'NDWI')
-        evi_n  = normalize(evi,  'EVI')
+        ndwi_n = normalize(indices.select('NDWI'), 'NDWI')
+        evi_n  = normalize(indices.select('EVI'),  'EVI')
 
         score = (ndvi_n.multiply(0.60)
                  .add(ndwi_n.multiply(0.25))
                  .add(evi_n.multiply(0.15))
                  .rename('score'))
 
+        # Umbrales en servidor: no hace falta traerlos para construir las zonas
         percs = score.reduceRegion(
-            ee.Reducer.percentile([33, 66]), roi, 10, maxPixels=1e9
-        ).getInfo()
-        p33 = percs.get('score_p33', 0.33)
-        p66 = percs.get('score_p66', 0.66)
-
-        print(f"  VRA score thresholds — P33: {p33:.3f}, P66: {p66:.3f}")
+            ee.Reducer.percentile([33, 66]), roi, 10, maxPixels=1e9)
+        # Sin píxeles válidos el percentil es null: 0.33/0.66 como antes
+        p33 = ee.Number(ee.Algorithms.If(percs.get('score_p33'), percs.get('score_p33'), 0.33))
+        p66 = ee.Number(ee.Algorithms.If(percs.get('score_p66'), percs.get('score_p66'), 0.66))
 
         vra = (score.lt(p33).multiply(0)
                .add(score.gte(p33).And(score.lt(p66)).multiply(1))
@@ -654,23 +664,37 @@ def calculate_vra_zones(composite_clipped, roi):
                .rename('zone')
                .updateMask(ndvi.mask()))
 
+        # Medias de los índices y área por zona en una sola pasada: un reducer
+        # agrupado por la banda 'zone' (entradas: NDVI, NDWI, EVI, pixelArea)
+        zone_reducer = (ee.Reducer.mean().repeat(3)
+                        .combine(ee.Reducer.sum())
+                        .group(groupField=4, groupName='zone'))
+        groups = (indices.addBands(ee.Image.pixelArea()).addBands(vra)
+                  .reduceRegion(zone_reducer, roi, 10, maxPixels=1e9))
+
+        # Umbrales + grupos en un ee.Dictionary evaluado con un único getInfo
+        stats = ee.Dictionary({'p33': p33, 'p66': p66,
+                               'groups': groups.get('groups')}).getInfo()
+
+        p33_v, p66_v = stats.get('p33'), stats.get('p66')
+        print(f"  VRA score thresholds — P33: {p33_v if p33_v is None else f'{p33_v:.3f}'}, "
+              f"P66: {p66_v if p66_v is None else f'{p66_v:.3f}'}")
+
+        by_zone = {int(g['zone']): g for g in stats.get('groups') or []}
         vra_stats = []
         for z, label, rec in [(0, 'Bajo vigor', 'Dosis alta'),
                                (1, 'Vigor medio', 'Dosis media'),
                                (2, 'Alto vigor', 'Dosis baja')]:
-            zm = vra.eq(z)
-            area = zm.multiply(ee.Image.pixelArea()).reduceRegion(
-                ee.Reducer.sum(), roi, 10, maxPixels=1e9).getInfo()
-            idx = composite_clipped.select(['NDVI', 'NDWI', 'EVI']).updateMask(zm).reduceRegion(
-                ee.Reducer.mean(), roi, 10, maxPixels=1e9).getInfo()
+            g = by_zone.get(z, {})
+            ndvi_m, ndwi_m, evi_m = g.get('mean') or (0, 0, 0)
             vra_stats.append({
                 'zone': z,
                 'label': label,
                 'recommendation': rec,
-                'area_ha': round(area.get('zone', 0) / 10000, 2),
-                'ndvi_mean': round(idx.get('NDVI', 0) or 0, 3),
-                'ndwi_mean': round(idx.get('NDWI', 0) or 0, 3),
-                'evi_mean':  round(idx.get('EVI',  0) or 0, 3),
+                'area_ha': round((g.get('sum', 0) or 0) / 10000, 2),
+                'ndvi_mean': round(ndvi_m or 0, 3),
+                'ndwi_mean': round(ndwi_m or 0, 3),
+                'evi_mean':  round(evi_m or 0, 3),
             })
 
         return vra, vra_stats
@@ -14,6 +14,7 @@ Fecha: 2026-03
 
 import io
 import base64
+import binascii
 from datetime import datetime, date
 from typing import Optional, List, Dict, Any
 
@@ -772,7 +773,7 @@ def generate_pac_report(data: Dict[str, Any]) -> Dict[str, Any]:
 
         generator = PacReportGenerator(data)
         pdf_bytes = generator.generate()
-        pdf_b64   = base64.b64encode(pdf_bytes).decode('utf-8')
+        pdf_b64   = binascii.b2a_base64(pdf_bytes, newline=False).decode('ascii')
 
         report_ref = data.get('report_ref', 'PAC-UNKNOWN')
         filename   = f'InformePAC_{report_ref}.pdf'
@@ -42,7 +42,9 @@ Fecha: 2026-03
 import io
 import re
 import base64
+import binascii
 import json
+import logging
 import math
 from datetime import datetime
 from typing import Optional, Dict, List, Any, Tuple
@@ -69,6 +71,8 @@ import matplotlib.ticker as ticker
 from matplotlib.patches import FancyBboxPatch
 import numpy as np
 
+logger = logging.getLogger("muorbita")
+
 
 # ============================================================
 # 1. CORPORATE COLOR PALETTE
@@ -2227,16 +2231,35 @@ class MuOrbitaPDFGenerator:
 # 7. PUBLIC API FUNCTION
 # ============================================================
 
-def generate_muorbita_report(data: Dict[str, Any]) -> Dict[str, Any]:
+def report_filename(data: Dict[str, Any]) -> str:
+    return f"Informe_MUORBITA_{data.get('job_id', 'UNKNOWN')}.pdf"
+
+
+def render_muorbita_pdf(data: Dict[str, Any]) -> bytes:
+    """Genera el PDF y devuelve los bytes tal cual (sin base64)."""
+    return MuOrbitaPDFGenerator(data).generate()
+
+
+def generate_muorbita_report(data: Dict[str, Any],
+                             max_inline_bytes: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Genera el PDF y lo devuelve en base64. Si supera max_inline_bytes no se
+    codifica: pdf_base64 va a None y los bytes crudos en 'pdf_bytes', para que
+    el llamador los sirva como fichero.
+    """
     try:
         generator = MuOrbitaPDFGenerator(data)
         pdf_bytes = generator.generate()
 
-        pdf_base64 = base64.b64encode(pdf_bytes).decode('utf-8')
+        if max_inline_bytes and len(pdf_bytes) > max_inline_bytes:
+            pdf_base64 = None
+        else:
+            # Una sola pasada de codificación; el resultado es ASCII puro
+            pdf_base64 = binascii.b2a_base64(pdf_bytes, newline=False).decode('ascii')
         job_id = data.get('job_id', 'UNKNOWN')
-        filename = f'Informe_MUORBITA_{job_id}.pdf'
+        filename = report_filename(data)
 
-        return {
+        result = {
             'success': True,
             'pdf_base64': pdf_base64,
             'filename': filename,
@@ -2248,13 +2271,16 @@ def generate_muorbita_report(data: Dict[str, Any]) -> Dict[str, Any]:
             'has_narratives': bool(generator.narratives),
             'narrative_fields': list(generator.narratives.keys()) if generator.narratives else [],
         }
+        if pdf_base64 is None:
+            result['pdf_bytes'] = pdf_bytes
+        return result
 
     except Exception as e:
-        import traceback
+        # El traceback va al log; el resultado solo lleva el mensaje
+        logger.exception("Error generando PDF para job %s", data.get('job_id', 'UNKNOWN'))
         return {
             'success': False,
             'error': str(e),
-            'traceback': traceback.format_exc(),
             'job_id': data.get('job_id', 'UNKNOWN'),
         }
 
@@ -2400,4 +2426,3 @@ if __name__ == '__main__':
         print(f"   Narrativas: {result['has_narratives']} ({len(result['narrative_fields'])} campos)")
     else:
         print(f"❌ Error: {result['error']}")
-        print(result.get('traceback', ''))
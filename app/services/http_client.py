@@ -0,0 +1,41 @@
+"""
+Mu.Orbita API - HTTP Client
+Cliente httpx compartido por todo el proceso: reutiliza conexiones TCP/TLS
+(keep-alive y, si httpx[http2] está instalado, multiplexado HTTP/2).
+Se crea bajo demanda y se cierra en el shutdown de la app.
+"""
+
+from typing import Optional
+import httpx
+
+try:
+    import h2  # noqa: F401 - requerido por httpx para HTTP/2
+    HTTP2_ENABLED = True
+except ImportError:
+    HTTP2_ENABLED = False
+
+HTTP_TIMEOUT_SECONDS = 30
+HTTP_LIMITS = httpx.Limits(max_keepalive_connections=50)
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Devuelve el AsyncClient compartido (lo crea la primera vez)"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_ENABLED,
+            timeout=HTTP_TIMEOUT_SECONDS,
+            limits=HTTP_LIMITS,
+            follow_redirects=True,
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Cierra el cliente compartido (shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -70,6 +70,76 @@ class ImageProvider(ABC):
         pass
 
 
+_BOUNDS_COLUMNS = {
+    'bounds_north': 'north',
+    'bounds_south': 'south',
+    'bounds_east': 'east',
+    'bounds_west': 'west',
+}
+
+
+def gee_images_upsert_stmt(job_id: str, images: Dict[str, str],
+                           bounds: Optional[dict] = None):
+    """
+    Guarda varios PNG (base64) de un job en una sola sentencia:
+    INSERT ... ON CONFLICT (job_id, index_type) DO UPDATE, sin SELECT previo.
+    Los bounds solo se sobrescriben si vienen informados.
+    None si no hay imágenes que guardar.
+    """
+    from sqlalchemy import func, literal_column
+    from sqlalchemy.dialects.postgresql import insert
+    from app.models.gee_image import GEEImage
+
+    bounds = bounds or {}
+    rows = [{
+        'job_id': job_id,
+        'index_type': index_type,
+        'filename': f"PNG_{index_type}.png",
+        'png_base64': b64_data,
+        **{column: bounds.get(key) for column, key in _BOUNDS_COLUMNS.items()},
+    } for index_type, b64_data in images.items()]
+    if not rows:
+        return None
+
+    stmt = insert(GEEImage).values(rows)
+    set_ = {
+        'png_base64': stmt.excluded.png_base64,
+        'filename': stmt.excluded.filename,
+        'updated_at': func.now(),
+    }
+    if bounds:
+        set_.update({column: stmt.excluded[column] for column in _BOUNDS_COLUMNS})
+    return stmt.on_conflict_do_update(
+        index_elements=[GEEImage.job_id, GEEImage.index_type],
+        set_=set_,
+    ).returning(
+        GEEImage.index_type,
+        # xmax = 0 solo en filas recién insertadas
+        literal_column("xmax = 0").label("inserted"),
+    )
+
+
+def _upsert_actions(rows) -> Dict[str, str]:
+    return {row.index_type: 'created' if row.inserted else 'updated' for row in rows}
+
+
+def upsert_gee_images(db, job_id: str, images: Dict[str, str],
+                      bounds: Optional[dict] = None) -> Dict[str, str]:
+    """
+    Ejecuta gee_images_upsert_stmt en una Session sync. No hace commit.
+    Devuelve {index_type: 'created' | 'updated'}.
+    """
+    stmt = gee_images_upsert_stmt(job_id, images, bounds)
+    return _upsert_actions(db.execute(stmt)) if stmt is not None else {}
+
+
+async def upsert_gee_images_async(db, job_id: str, images: Dict[str, str],
+                                  bounds: Optional[dict] = None) -> Dict[str, str]:
+    """Igual que upsert_gee_images, con AsyncSession"""
+    stmt = gee_images_upsert_stmt(job_id, images, bounds)
+    return _upsert_actions(await db.execute(stmt)) if stmt is not None else {}
+
+
 class PostgresImageProvider(ImageProvider):
     """
     MVP: Almacena PNGs como base64 en PostgreSQL.
@@ -92,39 +162,10 @@ class PostgresImageProvider(ImageProvider):
         return self.store_base64(job_id, index_type, b64, format, metadata)
 
     def store_base64(self, job_id, index_type, b64_data, format='png', metadata=None):
-        GEEImage = self._get_model()
         db = self._get_db()
         try:
-            existing = db.query(GEEImage).filter(
-                GEEImage.job_id == job_id,
-                GEEImage.index_type == index_type
-            ).first()
-
-            bounds = metadata or {}
             size_kb = len(b64_data) * 3 // 4 // 1024  # approx decoded size
-
-            if existing:
-                existing.png_base64 = b64_data
-                existing.filename = f"PNG_{index_type}.png"
-                if bounds:
-                    existing.bounds_north = bounds.get('north')
-                    existing.bounds_south = bounds.get('south')
-                    existing.bounds_east = bounds.get('east')
-                    existing.bounds_west = bounds.get('west')
-                action = 'updated'
-            else:
-                db.add(GEEImage(
-                    job_id=job_id,
-                    index_type=index_type,
-                    filename=f"PNG_{index_type}.png",
-                    png_base64=b64_data,
-                    bounds_north=bounds.get('north'),
-                    bounds_south=bounds.get('south'),
-                    bounds_east=bounds.get('east'),
-                    bounds_west=bounds.get('west'),
-                ))
-                action = 'created'
-
+            action = upsert_gee_images(db, job_id, {index_type: b64_data}, metadata)[index_type]
             db.commit()
             logger.info(f"📷 {action} {index_type} for {job_id} (~{size_kb} KB)")
             return f"db://{job_id}/{index_type}"
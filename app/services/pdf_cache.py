@@ -0,0 +1,181 @@
+"""
+Mu.Orbita API - PDF Cache
+Cache en disco de los PDFs de informes descargados de Drive.
+La primera descarga se sirve en streaming desde Drive y a la vez se
+escribe en disco; las siguientes salen del fichero local sin tocar Drive.
+Solo se cachea lo que empieza por %PDF, y la cache se poda por antigüedad
+(PDF_CACHE_MAX_AGE_HOURS) y tamaño total (PDF_CACHE_MAX_MB).
+También guarda los PDFs de /generate-pdf demasiado grandes para ir en base64,
+durante GENERATED_PDF_TTL_HOURS. Están en el disco local: su pdf_url solo
+resuelve en la instancia que lo generó, salvo que PDF_CACHE_DIR sea un
+volumen compartido entre réplicas.
+"""
+
+from pathlib import Path
+from typing import AsyncIterator, Optional
+import hashlib
+import logging
+import os
+import time
+import uuid
+
+import aiofiles
+import aiofiles.os
+from starlette.concurrency import run_in_threadpool
+
+from app.config import settings
+
+logger = logging.getLogger("muorbita")
+
+PDF_CHUNK_SIZE = 65536
+PDF_MAGIC = b"%PDF"
+# Como mucho una pasada de limpieza cada PRUNE_INTERVAL_SECONDS por proceso
+PRUNE_INTERVAL_SECONDS = 600
+# Un .part más viejo que esto es de una descarga que murió a medias
+STALE_PART_SECONDS = 3600
+
+_last_prune = 0.0
+
+
+def pdf_cache_path(report_id, source_url: str) -> Path:
+    """
+    Ruta del PDF cacheado. La URL de origen forma parte del nombre: si el
+    informe se regenera con otro fichero de Drive, la entrada vieja no se usa.
+    """
+    digest = hashlib.sha1(source_url.encode()).hexdigest()[:16]
+    return Path(settings.pdf_cache_dir) / f"{report_id}-{digest}.pdf"
+
+
+async def get_cached_pdf(path: Path) -> Optional[Path]:
+    """El fichero si ya está en cache, o None"""
+    try:
+        if await aiofiles.os.path.isfile(path):
+            return path
+    except OSError:
+        pass
+    return None
+
+
+def generated_pdf_path(pdf_id: str) -> Path:
+    return Path(settings.pdf_cache_dir) / "generated" / f"{pdf_id}.pdf"
+
+
+async def save_generated_pdf(pdf_bytes: bytes) -> str:
+    """
+    Guarda un PDF generado y devuelve su id (uuid4 hex, no adivinable).
+    Se escribe a un .part y se renombra: GET /pdf/{id} nunca ve uno a medias.
+    """
+    pdf_id = uuid.uuid4().hex
+    path = generated_pdf_path(pdf_id)
+    tmp_path = path.with_name(f"{path.name}.part")
+    await aiofiles.os.makedirs(path.parent, exist_ok=True)
+    out = await aiofiles.open(tmp_path, "wb")
+    try:
+        await out.write(pdf_bytes)
+    finally:
+        await out.close()
+    os.replace(tmp_path, path)
+    await maybe_prune_pdf_cache()
+    return pdf_id
+
+
+def prune_pdf_cache(directory: Path, max_age_seconds: float, max_bytes: int) -> None:
+    """
+    Borra los PDFs más antiguos que max_age_seconds y, si el resto sigue
+    pasando de max_bytes, los de mtime más viejo hasta quedar por debajo.
+    Síncrono (scandir + unlink): llamarlo en el threadpool.
+    """
+    now = time.time()
+    kept = []
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+            age = now - stat.st_mtime
+            if entry.name.endswith(".part"):
+                if age > STALE_PART_SECONDS:
+                    os.unlink(entry.path)
+                continue
+            if age > max_age_seconds:
+                os.unlink(entry.path)
+            else:
+                kept.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            continue
+
+    total = sum(size for _, size, _ in kept)
+    for _, size, path in sorted(kept):
+        if total <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def _prune_all() -> None:
+    max_bytes = settings.pdf_cache_max_mb * 1024 * 1024
+    cache_dir = Path(settings.pdf_cache_dir)
+    prune_pdf_cache(cache_dir, settings.pdf_cache_max_age_hours * 3600, max_bytes)
+    prune_pdf_cache(cache_dir / "generated", settings.generated_pdf_ttl_hours * 3600, max_bytes)
+
+
+async def maybe_prune_pdf_cache() -> None:
+    """
+    Limpieza de la cache de Drive y de los PDFs generados, como mucho cada
+    PRUNE_INTERVAL_SECONDS por proceso
+    """
+    global _last_prune
+    now = time.monotonic()
+    if now - _last_prune < PRUNE_INTERVAL_SECONDS:
+        return
+    _last_prune = now
+    await run_in_threadpool(_prune_all)
+
+
+async def stream_and_cache(chunks: AsyncIterator[bytes], path: Path) -> AsyncIterator[bytes]:
+    """
+    Reenvía los chunks al cliente mientras los escribe en un .part temporal.
+    Solo si la descarga termina completa y es un PDF (empieza por %PDF) se
+    renombra al nombre final: nunca se cachea un PDF truncado ni una página
+    HTML de Drive (aviso de antivirus, cuota) servida con 200.
+    """
+    tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.part")
+    try:
+        await aiofiles.os.makedirs(path.parent, exist_ok=True)
+        out = await aiofiles.open(tmp_path, "wb")
+    except OSError as e:
+        # Sin disco escribible: se sirve igual, solo que sin cachear
+        logger.warning("PDF cache no disponible (%s): %s", path.parent, e)
+        async for chunk in chunks:
+            yield chunk
+        return
+
+    complete = False
+    head = b""
+    try:
+        async for chunk in chunks:
+            if len(head) < len(PDF_MAGIC):
+                head += chunk[:len(PDF_MAGIC)]
+            await out.write(chunk)
+            yield chunk
+        complete = True
+    finally:
+        await out.close()
+        if complete and head.startswith(PDF_MAGIC):
+            os.replace(tmp_path, path)
+        else:
+            if complete:
+                logger.warning("Descarga sin cabecera %%PDF, no se cachea: %s", path.name)
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+    if complete:
+        await maybe_prune_pdf_cache()
@@ -0,0 +1,58 @@
+"""
+Mu.Orbita API - Query Guard
+Solo en desarrollo/CI: cuenta las queries SQL de cada request para detectar
+regresiones N+1 (un endpoint que pasa de 1-2 queries a una por fila).
+Añade X-DB-Queries a la respuesta y, con DB_QUERY_GUARD_MAX > 0, la request
+falla si lo supera.
+"""
+
+from contextvars import ContextVar
+from typing import List, Optional
+import logging
+
+from fastapi import Request
+from sqlalchemy import event
+
+from app.config import settings
+from app.database import async_engine, engine
+
+logger = logging.getLogger("muorbita")
+
+# [nº de queries] de la request en curso; None fuera de una request
+_request_queries: ContextVar[Optional[List[int]]] = ContextVar("request_queries", default=None)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    counter = _request_queries.get()
+    if counter is not None:
+        counter[0] += 1
+
+
+def install_query_guard() -> None:
+    """Engancha el contador a ambos engines (sync y asyncpg)"""
+    for target in (engine, async_engine.sync_engine):
+        if not event.contains(target, "before_cursor_execute", _count_query):
+            event.listen(target, "before_cursor_execute", _count_query)
+
+
+async def query_guard_middleware(request: Request, call_next):
+    counter = [0]
+    token = _request_queries.set(counter)
+    try:
+        response = await call_next(request)
+    finally:
+        _request_queries.reset(token)
+
+    count = counter[0]
+    response.headers["X-DB-Queries"] = str(count)
+    budget = settings.db_query_guard_max
+    if budget and count > budget:
+        logger.warning("%s %s: %d queries (máximo %d)", request.method, request.url.path, count, budget)
+        raise QueryBudgetExceeded(
+            f"{request.method} {request.url.path} ejecutó {count} queries (máximo {budget})"
+        )
+    return response
@@ -0,0 +1,96 @@
+"""
+Mu.Orbita API - Rate Limiting
+Token bucket por (ruta, IP/email) para los endpoints de auth que ejecutan
+bcrypt. Con Redis el contador se comparte entre workers (INCR + EXPIRE por
+ventana); sin Redis, token bucket en memoria del proceso.
+Al agotarse responde 429 + Retry-After.
+"""
+
+from typing import Optional
+import math
+import threading
+import time
+
+from cachetools import TTLCache
+from fastapi import HTTPException, Request, status
+
+from app.config import settings
+from app.services.redis_client import get_redis, mark_redis_down
+
+# Estado local de los buckets: (tokens, último refill). Se olvidan tras 10 min.
+_buckets: TTLCache = TTLCache(maxsize=100_000, ttl=600)
+_buckets_lock = threading.Lock()
+
+
+def client_ip(request: Request) -> str:
+    """
+    IP del cliente según la conexión. X-Forwarded-For no se lee aquí: lo
+    puede inventar el cliente y daría un bucket nuevo en cada petición.
+    Detrás de un proxy, uvicorn (--proxy-headers) reescribe request.client
+    solo si el peer está en FORWARDED_ALLOW_IPS.
+    """
+    return request.client.host if request.client else "unknown"
+
+
+def _local_take(key: str, limit: int, window: float) -> float:
+    """Consume un token; devuelve 0 si se permite o los segundos a esperar"""
+    rate = limit / window
+    now = time.monotonic()
+    with _buckets_lock:
+        tokens, updated = _buckets.get(key, (float(limit), now))
+        tokens = min(float(limit), tokens + (now - updated) * rate)
+        if tokens >= 1:
+            _buckets[key] = (tokens - 1, now)
+            return 0.0
+        _buckets[key] = (tokens, now)
+    return (1 - tokens) / rate
+
+
+async def _redis_take(key: str, limit: int, window: int) -> Optional[float]:
+    """Ventana fija compartida en Redis; None si Redis no está disponible"""
+    client = get_redis()
+    if client is None:
+        return None
+    redis_key = f"ratelimit:{key}"
+    try:
+        pipe = client.pipeline()
+        pipe.incr(redis_key)
+        pipe.ttl(redis_key)
+        count, ttl = await pipe.execute()
+        if ttl < 0:
+            await client.expire(redis_key, window)
+            ttl = window
+    except Exception as e:
+        mark_redis_down(e)
+        return None
+    return 0.0 if count <= limit else float(ttl)
+
+
+async def enforce_rate_limit(
+    scope: str,
+    key: str,
+    limit: Optional[int] = None,
+    window: Optional[int] = None,
+) -> None:
+    """Lanza 429 si (scope, key) ha superado el límite en la ventana"""
+    limit = limit or settings.auth_rate_limit_attempts
+    window = window or settings.auth_rate_limit_window_seconds
+    bucket_key = f"{scope}:{key}"
+
+    retry_after = await _redis_take(bucket_key, limit, window)
+    if retry_after is None:
+        retry_after = _local_take(bucket_key, limit, window)
+
+    if retry_after > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiados intentos, inténtalo de nuevo en unos segundos",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+
+def rate_limit(scope: str, limit: Optional[int] = None, window: Optional[int] = None):
+    """Dependency: limita la ruta por IP del cliente"""
+    async def _rate_limit_dependency(request: Request) -> None:
+        await enforce_rate_limit(scope, client_ip(request), limit, window)
+    return _rate_limit_dependency
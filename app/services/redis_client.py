@@ -0,0 +1,61 @@
+"""
+Mu.Orbita API - Redis Client
+Cliente Redis compartido entre workers (opcional).
+Si REDIS_URL no está configurado o el paquete redis no está instalado,
+get_redis() devuelve None y los caches quedan solo en memoria local.
+"""
+
+from typing import Optional
+import logging
+import time
+
+from app.config import settings
+
+logger = logging.getLogger("muorbita")
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+# Tras un fallo, no reintentar Redis durante este tiempo
+REDIS_RETRY_AFTER_SECONDS = 30
+
+_client = None
+_disabled_until = 0.0
+
+
+def get_redis() -> Optional["aioredis.Redis"]:
+    """
+    Cliente redis.asyncio para el código async: un Redis lento no bloquea
+    el event loop (socket_timeout sigue acotando cada llamada).
+    None si no está disponible.
+    """
+    global _client
+    if aioredis is None or not settings.redis_url:
+        return None
+    if time.monotonic() < _disabled_until:
+        return None
+
+    if _client is None:
+        _client = aioredis.Redis.from_url(
+            settings.redis_url,
+            socket_timeout=settings.redis_socket_timeout,
+            socket_connect_timeout=settings.redis_socket_timeout,
+        )
+    return _client
+
+
+async def close_redis() -> None:
+    """Cierra el pool del cliente async (shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def mark_redis_down(error: Exception) -> None:
+    """Desactiva Redis temporalmente; los caches siguen en memoria local"""
+    global _disabled_until
+    _disabled_until = time.monotonic() + REDIS_RETRY_AFTER_SECONDS
+    logger.warning("⚠️ Redis no disponible (%s), reintento en %ss", error, REDIS_RETRY_AFTER_SECONDS)
@@ -0,0 +1,137 @@
+"""
+Mu.Orbita API - Response Cache
+Cache de respuestas JSON ya serializadas (bytes) + ETag.
+Con Redis la cache se comparte entre workers y las invalidaciones llegan
+a todos. Sin Redis no se cachea, salvo con RESPONSE_CACHE_LOCAL=true
+(TTLCache en memoria del proceso): solo es correcto con un único worker,
+porque una invalidación en un worker no llega a los demás.
+"""
+
+from typing import Optional
+import hashlib
+import threading
+import time
+
+from cachetools import TTLCache
+from fastapi import Request, Response
+
+from app.config import settings
+from app.services.redis_client import get_redis, mark_redis_down
+
+DASHBOARD_CACHE_TTL_SECONDS = 60
+DASHBOARD_VERSION_TTL_SECONDS = 86400
+
+# Entradas locales: (body, expires_at). El TTL de la TTLCache es solo el máximo.
+_local_cache: TTLCache = TTLCache(maxsize=10_000, ttl=3600)
+_local_versions: TTLCache = TTLCache(maxsize=10_000, ttl=DASHBOARD_VERSION_TTL_SECONDS)
+_local_cache_lock = threading.Lock()
+
+
+async def _dashboard_version(client_id) -> int:
+    """Versión de la cache del dashboard del cliente (sube con cada invalidación)"""
+    client = get_redis()
+    if client is not None:
+        try:
+            return int(await client.get(f"dashver:{client_id}") or 0)
+        except Exception as e:
+            mark_redis_down(e)
+
+    with _local_cache_lock:
+        return _local_versions.get(str(client_id), 0)
+
+
+async def dashboard_cache_key(client_id, name: str) -> str:
+    """
+    Clave de una respuesta del dashboard (summary, alerts, map-data...).
+    Incluye la versión del cliente: invalidar es subir la versión y las
+    entradas antiguas caducan solas por TTL.
+    """
+    return f"dash:{client_id}:v{await _dashboard_version(client_id)}:{name}"
+
+
+async def get_cached_response(key: str) -> Optional[bytes]:
+    """Body cacheado para la clave, o None"""
+    client = get_redis()
+    if client is not None:
+        try:
+            return await client.get(f"resp:{key}")
+        except Exception as e:
+            mark_redis_down(e)
+
+    if not settings.response_cache_local:
+        return None
+    with _local_cache_lock:
+        entry = _local_cache.get(key)
+    if entry is not None and time.monotonic() < entry[1]:
+        return entry[0]
+    return None
+
+
+async def set_cached_response(key: str, body: bytes, ttl_seconds: int) -> None:
+    client = get_redis()
+    if client is not None:
+        try:
+            await client.setex(f"resp:{key}", ttl_seconds, body)
+            return
+        except Exception as e:
+            mark_redis_down(e)
+
+    if not settings.response_cache_local:
+        return
+    with _local_cache_lock:
+        _local_cache[key] = (body, time.monotonic() + ttl_seconds)
+
+
+async def invalidate_responses(*keys: str) -> None:
+    """Elimina las claves (ingesta de KPIs, cambios de parcelas/reports)"""
+    with _local_cache_lock:
+        for key in keys:
+            _local_cache.pop(key, None)
+
+    client = get_redis()
+    if client is not None and keys:
+        try:
+            await client.delete(*(f"resp:{key}" for key in keys))
+        except Exception as e:
+            mark_redis_down(e)
+
+
+async def invalidate_client_dashboard(client_id) -> None:
+    """Invalida todas las respuestas cacheadas del dashboard del cliente"""
+    if not client_id:
+        return
+
+    key = str(client_id)
+    with _local_cache_lock:
+        _local_versions[key] = _local_versions.get(key, 0) + 1
+
+    client = get_redis()
+    if client is not None:
+        try:
+            pipe = client.pipeline()
+            pipe.incr(f"dashver:{key}")
+            pipe.expire(f"dashver:{key}", DASHBOARD_VERSION_TTL_SECONDS)
+            await pipe.execute()
+        except Exception as e:
+            mark_redis_down(e)
+
+
+def etag_for(body: bytes) -> str:
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+def json_response_with_etag(
+    request: Request,
+    body: bytes,
+    cache_control: str = "private, no-cache",
+) -> Response:
+    """
+    Respuesta JSON con ETag = hash del body; 304 si el cliente ya tiene esta
+    versión. Al salir del body, cualquier cambio (también los que no
+    invalidan la cache) cambia el ETag en cuanto caduca la entrada.
+    """
+    etag = etag_for(body)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)